@@ -0,0 +1,220 @@
+"""End-to-end benchmark of the hot API routes, for comparing commits.
+
+Seeds a throwaway database with synthetic users, posts, comments and likes, then drives the real app
+through httpx's ASGI transport and prints one JSON document with throughput, p50/p99 latency and SQL
+statements per request for every scenario:
+
+    DATABASE_URL=sqlite:///./bench.db SECRET_KEY=bench python -m benchmarks.api --users 10000 --output base.json
+    DATABASE_URL=sqlite:///./bench.db SECRET_KEY=bench python -m benchmarks.api --reuse --compare base.json
+
+Row counts scale independently (--users/--posts/--comments/--likes, up to millions); pass --reuse to skip
+seeding on later runs. Seeding drops every table first, so it refuses anything but a SQLite bench*.db file
+unless --yes-drop is passed. Rate limits are switched off for the run; the concurrency limiter stays on, so
+requests it sheds show up as errors.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from prometheus_client import REGISTRY
+from sqlalchemy import func, insert, select
+
+from benchmarks.common import add_drop_argument, check_throwaway
+from core.config import settings
+from core.database import SessionLocal, engine
+from main import app
+from models import models
+from routes.auth import create_access_token
+from services.passwords import bcrypt_context
+
+PASSWORD = "bench-password"
+FIRST_NAMES = ["Ana", "Bruno", "Carla", "Diego", "Elena", "Felipe", "Gabriela", "Hugo", "Irene", "Javier",
+               "Lucia", "Manuel", "Nora", "Oscar", "Paula", "Ramon", "Sofia", "Tomas", "Valeria", "Xavier"]
+LAST_NAMES = ["Garcia", "Martinez", "Lopez", "Sanchez", "Perez", "Gomez", "Martin", "Jimenez", "Ruiz", "Hernandez",
+              "Diaz", "Moreno", "Alvarez", "Romero", "Navarro", "Torres", "Dominguez", "Vazquez", "Ramos", "Gil"]
+CHUNK = 20000
+
+
+async def insert_chunked(conn, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == CHUNK:
+            await conn.execute(insert(table), batch)
+            batch = []
+    if batch:
+        await conn.execute(insert(table), batch)
+
+
+async def seed(rng: random.Random, users: int, posts: int, comments: int, likes: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+
+    # Posts and comments are spread over the last 30 days; counters are kept consistent with the rows
+    now = datetime.now()
+    hashed = bcrypt_context.hash(PASSWORD)
+    post_authors = [rng.randint(1, users) for _ in range(posts)]
+    comment_posts = [rng.randint(1, posts) for _ in range(comments)]
+    like_pairs = set()
+    while len(like_pairs) < min(likes, users * posts):
+        like_pairs.add((rng.randint(1, users), rng.randint(1, posts)))
+    like_count, comment_count = [0] * (posts + 1), [0] * (posts + 1)
+    for _, post_id in like_pairs:
+        like_count[post_id] += 1
+    for post_id in comment_posts:
+        comment_count[post_id] += 1
+
+    async with engine.begin() as conn:
+        await insert_chunked(conn, models.User, (
+            {"id": i, "username": f"user{i}", "email": f"user{i}@bench.local", "password": hashed,
+             "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"} for i in range(1, users + 1)))
+        await insert_chunked(conn, models.Post, (
+            {"id": i, "title": f"Post {i}", "body": "body", "user_id": post_authors[i - 1],
+             "create_date": now - timedelta(seconds=rng.randint(0, 30 * 86400)),
+             "like_count": like_count[i], "comment_count": comment_count[i]} for i in range(1, posts + 1)))
+        await insert_chunked(conn, models.Comment, (
+            {"body": "comment", "user_id": rng.randint(1, users), "post_id": post_id,
+             "create_date": now - timedelta(seconds=rng.randint(0, 30 * 86400))} for post_id in comment_posts))
+        await insert_chunked(conn, models.Like, ({"user_id": u, "post_id": p} for u, p in like_pairs))
+
+
+async def table_sizes():
+    async with SessionLocal() as db:
+        return {model.__tablename__: await db.scalar(select(func.count()).select_from(model))
+                for model in (models.User, models.Post, models.Comment, models.Like)}
+
+
+def scenarios(users: int, posts: int):
+    # Each request draws its own inputs so cached routes see a realistic mix of hits and misses
+    return {
+        "/posts/all": lambda rng: ("GET", "/posts/all", {}),
+        "/comments/{post_id}": lambda rng: ("GET", f"/comments/{rng.randint(1, posts)}", {}),
+        "/users/search": lambda rng: ("GET", "/users/search",
+                                      {"params": {"query": rng.choice(FIRST_NAMES + LAST_NAMES)[:rng.randint(2, 5)]}}),
+        "/users/suggested": lambda rng: ("GET", "/users/suggested", {}),
+        "/auth/token": lambda rng: ("POST", "/auth/token",
+                                    {"data": {"username": f"user{rng.randint(1, users)}", "password": PASSWORD}}),
+    }
+
+
+def sql_statements(route: str):
+    # Read back from the per-route histogram that InstrumentationMiddleware feeds
+    labels = {"route": route}
+    return (REGISTRY.get_sample_value("db_statements_per_request_sum", labels) or 0,
+            REGISTRY.get_sample_value("db_statements_per_request_count", labels) or 0)
+
+
+async def run_scenario(client: httpx.AsyncClient, tokens: list, route: str, make_request, concurrency: int,
+                       requests: int, seed: int):
+    latencies, errors = [], 0
+
+    async def worker(index: int, count: int):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + index)
+        headers = {"Authorization": f"Bearer {tokens[index % len(tokens)]}"}
+        for _ in range(count):
+            method, url, kwargs = make_request(rng)
+            start = time.perf_counter()
+            response = await client.request(method, url, headers=headers, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    statements_before, count_before = sql_statements(route)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i, requests // concurrency + (i < requests % concurrency))
+                           for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    statements_after, count_after = sql_statements(route)
+    latencies.sort()
+    measured = count_after - count_before
+
+    return {"scenario": route, "requests": len(latencies), "errors": errors,
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+            "p99_ms": round(latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000, 2),
+            "sql_per_request": round((statements_after - statements_before) / measured, 2) if measured else None}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(__file__),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline: dict):
+    previous = {result["scenario"]: result for result in baseline["results"]}
+    for result in report["results"]:
+        before = previous.get(result["scenario"])
+        if before is None:
+            continue
+        changes = {key: f"{(result[key] - before[key]) / before[key] * 100:+.1f}%"
+                   for key in ("rps", "p50_ms", "p99_ms", "sql_per_request")
+                   if before.get(key) and result.get(key) is not None}
+        print(json.dumps({"scenario": result["scenario"], "against": baseline["meta"].get("commit"), **changes}))
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--comments", type=int, default=2000)
+    parser.add_argument("--likes", type=int, default=1000)
+    parser.add_argument("--reuse", action="store_true", help="keep the rows seeded by a previous run")
+    parser.add_argument("--requests", type=int, default=256, help="requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=32, help="requests for /auth/token, bcrypt bound")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenarios", nargs="+", help="route templates to run, all by default")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="print relative changes against an earlier report")
+    add_drop_argument(parser)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if not args.reuse:
+        check_throwaway(engine, args.yes_drop)
+        await seed(rng, args.users, args.posts, args.comments, args.likes)
+    sizes = await table_sizes()
+    settings.RATE_LIMIT_ENABLED = False
+
+    tokens = [create_access_token(f"user{i}", i, timedelta(hours=1))
+              for i in rng.sample(range(1, sizes["users"] + 1), min(64, sizes["users"]))]
+    selected = scenarios(sizes["users"], sizes["posts"])
+    results = []
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for route, make_request in selected.items():
+                if args.scenarios and route not in args.scenarios:
+                    continue
+                requests = args.login_requests if route == "/auth/token" else args.requests
+                results.append(await run_scenario(client, tokens, route, make_request, args.concurrency, requests,
+                                                  args.seed))
+    finally:
+        # Otherwise the driver's connection threads keep the process alive after an error
+        await engine.dispose()
+
+    report = {"meta": {"commit": git_commit(), "dialect": engine.dialect.name, "python": platform.python_version(),
+                       "concurrency": args.concurrency, "rows": sizes}, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,17 @@
+import argparse
+import os
+
+
+def add_drop_argument(parser: argparse.ArgumentParser):
+    parser.add_argument("--yes-drop", action="store_true",
+                        help="allow seeding a database other than a SQLite bench*.db file; drops every table in it")
+
+
+def check_throwaway(engine, yes_drop: bool):
+    # Seeding starts with drop_all, and DATABASE_URL may well come from the developer's .env
+    url = engine.url
+    name = os.path.basename(url.database or "")
+    throwaway = url.get_backend_name() == "sqlite" and (name in ("", ":memory:") or name.startswith("bench"))
+    if not (throwaway or yes_drop):
+        raise SystemExit(f"Refusing to drop every table in {url.render_as_string(hide_password=True)}: point "
+                         f"DATABASE_URL at a SQLite bench*.db file, or pass --yes-drop if it really is disposable")
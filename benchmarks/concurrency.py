@@ -0,0 +1,78 @@
+"""Concurrent throughput of a single worker against /posts/all.
+
+Run from the repository root against a throwaway SQLite database:
+
+    DATABASE_URL=sqlite:///./bench.db SECRET_KEY=bench python -m benchmarks.concurrency --posts 2000
+
+Every concurrency level is served by one event loop, which is what one uvicorn worker gets.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+import httpx
+
+from benchmarks.common import add_drop_argument, check_throwaway
+from core.database import SessionLocal, engine
+from main import app
+from models import models
+from routes.auth import create_access_token
+
+
+async def seed(posts: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+    async with SessionLocal() as db:
+        reader = models.User(full_name="Reader", username="reader", email="reader@bench.local", password="x")
+        author = models.User(full_name="Author", username="author", email="author@bench.local", password="x")
+        db.add_all([reader, author])
+        await db.flush()
+        db.add_all([models.Post(title=f"Post {i}", body="body", user_id=author.id) for i in range(posts)])
+        await db.commit()
+        return reader
+
+
+async def run_level(client: httpx.AsyncClient, headers: dict, concurrency: int, requests: int):
+    latencies = []
+
+    async def worker(count: int):
+        for _ in range(count):
+            start = time.perf_counter()
+            response = await client.get("/posts/all", headers=headers)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(requests // concurrency + (i < requests % concurrency))
+                           for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    return {"concurrency": concurrency, "requests": len(latencies), "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+            "p99_ms": round(latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000, 2)}
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 64])
+    add_drop_argument(parser)
+    args = parser.parse_args()
+
+    check_throwaway(engine, args.yes_drop)
+    reader = await seed(args.posts)
+    headers = {"Authorization": f"Bearer {create_access_token(reader.username, reader.id, timedelta(minutes=30))}"}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for level in args.levels:
+            print(json.dumps(await run_level(client, headers, level, args.requests)))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+"""Serialization cost of one feed page, untyped jsonable_encoder path vs typed models + orjson.
+
+    DATABASE_URL=sqlite:///./bench.db SECRET_KEY=bench python -m benchmarks.serialization --page-sizes 20 100
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import models
+from schemas.post_schemas import PostPage
+from services.feed import hydrate_feed
+
+
+def feed_page(size: int):
+    author = models.User(id=1, full_name="Author", username="author", email="author@bench.local",
+                         password="$2b$12$" + "x" * 53, profile_picture=None, create_date=datetime.now())
+    rows = []
+    for i in range(size):
+        post = models.Post(id=i, title=f"Post {i}", body="body " * 40, image=None, create_date=datetime.now(),
+                           user_id=1, like_count=i, comment_count=i)
+        # As loaded by the feed query: author set without populating the author.posts backref
+        set_committed_value(post, "author", author)
+        rows.append((post, models.Like(id=i, user_id=2, post_id=i) if i % 2 else None))
+    return hydrate_feed(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--number", type=int, default=500)
+    args = parser.parse_args()
+
+    for size in args.page_sizes:
+        posts = feed_page(size)
+
+        def untyped():
+            return JSONResponse(jsonable_encoder({"posts": posts, "next_cursor": None})).body
+
+        def typed():
+            page = PostPage.model_validate({"posts": posts, "next_cursor": None}, from_attributes=True)
+            return ORJSONResponse(page.model_dump(mode="json")).body
+
+        result = {"page_size": size}
+        for name, fn in (("untyped_us", untyped), ("typed_orjson_us", typed)):
+            result[name] = round(timeit.timeit(fn, number=args.number) / args.number * 1e6, 1)
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
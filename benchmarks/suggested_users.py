@@ -0,0 +1,70 @@
+"""Cost of picking suggested users as the users table grows.
+
+    DATABASE_URL=sqlite:///./bench.db SECRET_KEY=bench python -m benchmarks.suggested_users --users 1000000
+
+Seeding a million rows takes a little while; pass --reuse to skip it on later runs.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from sqlalchemy import insert, select, func
+
+from benchmarks.common import add_drop_argument, check_throwaway
+from core.database import SessionLocal, engine
+from models import models
+from services.suggestions import SuggestionPool
+
+
+async def seed(users: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+        for start in range(0, users, 50000):
+            await conn.execute(insert(models.User), [
+                {"full_name": f"User {i}", "username": f"user{i}", "email": f"user{i}@bench.local", "password": "x"}
+                for i in range(start, min(start + 50000, users))])
+
+
+async def timed(fn, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await fn()
+    return round((time.perf_counter() - start) / repeat * 1000, 3)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--reuse", action="store_true")
+    parser.add_argument("--legacy", action="store_true", help="also time the old full-table load")
+    add_drop_argument(parser)
+    args = parser.parse_args()
+
+    if not args.reuse:
+        check_throwaway(engine, args.yes_drop)
+        await seed(args.users)
+
+    async with SessionLocal() as db:
+        total = await db.scalar(select(func.count(models.User.id)))
+        pool = SuggestionPool(size=500, refresh_seconds=300)
+        result = {"users": total,
+                  "pool_refresh_ms": await timed(lambda: pool._refresh(db), 5),
+                  "sample_ms": await timed(lambda: pool.sample(db, 1, 5), args.repeat)}
+
+        if args.legacy:
+            async def legacy():
+                users = (await db.scalars(select(models.User))).all()
+                random.sample(users, min(len(users), 5))
+                db.expunge_all()
+            result["legacy_full_scan_ms"] = await timed(legacy, 1)
+
+    print(json.dumps(result))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+from core.config import settings
+
+
+class MemoryCache:
+    # In-process TTL + LRU store; every operation is O(1)
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: Optional[int] = None):
+        self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        value = int(await self.get(key) or 0) + 1
+        await self.set(key, str(value))
+        return value
+
+
+class RedisCache:
+    # Any client exposing the redis.asyncio API works, including fakeredis for tests
+    def __init__(self, client):
+        self.client = client
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.client.get(key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set(self, key: str, value: str, ttl: Optional[int] = None):
+        await self.client.set(key, value, ex=ttl)
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*keys)
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+
+def redis_client(url: str):
+    try:
+        from redis import asyncio as redis
+    except ImportError:
+        raise RuntimeError("CACHE_URL points to Redis but the redis package is not installed")
+    return redis.from_url(url)
+
+
+def is_redis_url(url: str) -> bool:
+    return url.startswith(("redis://", "rediss://"))
+
+
+def make_cache(url: str, max_entries: int):
+    if url.startswith("memory://"):
+        return MemoryCache(max_entries)
+    if is_redis_url(url):
+        return RedisCache(redis_client(url))
+    raise ValueError(f"Unsupported CACHE_URL: {url}")
+
+cache_backend = make_cache(settings.CACHE_URL, settings.CACHE_MAX_ENTRIES)
@@ -10,6 +10,66 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 180))
+    # Connection pool: recycle below the server/proxy idle timeout, pre-ping to survive failovers
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_HEALTH_TIMEOUT: float = float(os.getenv("DB_HEALTH_TIMEOUT", 2))
+    # Comma-separated read replicas for GET traffic; a replica lagging more than REPLICA_MAX_LAG_SECONDS is skipped
+    # and a client that just wrote reads from the primary for READ_AFTER_WRITE_SECONDS
+    DATABASE_REPLICA_URLS: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 5))
+    REPLICA_LAG_CHECK_SECONDS: float = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", 10))
+    READ_AFTER_WRITE_SECONDS: int = int(os.getenv("READ_AFTER_WRITE_SECONDS", 5))
+    # Requests issuing more SQL statements than this are logged as N+1 suspects
+    N_PLUS_ONE_THRESHOLD: int = int(os.getenv("N_PLUS_ONE_THRESHOLD", 20))
+    # bcrypt runs off the event loop in a "thread" or "process" pool; callers beyond MAX_PENDING get a 429
+    PASSWORD_HASH_EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32))
+    # "memory://" keeps the cache in-process; a redis:// URL shares it between workers
+    CACHE_URL: str = os.getenv("CACHE_URL", "memory://")
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+    # Home timelines keep the newest TIMELINE_SIZE post ids of readers seen in the last TIMELINE_IDLE_SECONDS;
+    # authors above TIMELINE_PROLIFIC_POSTS_PER_DAY are merged in at read time instead of fanned out
+    TIMELINE_SIZE: int = int(os.getenv("TIMELINE_SIZE", 500))
+    TIMELINE_IDLE_SECONDS: int = int(os.getenv("TIMELINE_IDLE_SECONDS", 24 * 60 * 60))
+    TIMELINE_PROLIFIC_POSTS_PER_DAY: int = int(os.getenv("TIMELINE_PROLIFIC_POSTS_PER_DAY", 50))
+    # Suggested users are drawn from a pool of random users refreshed every SUGGESTION_POOL_REFRESH_SECONDS
+    SUGGESTION_POOL_SIZE: int = int(os.getenv("SUGGESTION_POOL_SIZE", 500))
+    SUGGESTION_POOL_REFRESH_SECONDS: int = int(os.getenv("SUGGESTION_POOL_REFRESH_SECONDS", 300))
+    # Token buckets as "<requests>/<second|minute|hour>", per client IP for login and signup and per user for
+    # uploads; RATE_LIMIT_URL picks the bucket store (memory:// per worker, redis:// shared)
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_URL: str = os.getenv("RATE_LIMIT_URL", os.getenv("CACHE_URL", "memory://"))
+    RATE_LIMIT_LOGIN: str = os.getenv("RATE_LIMIT_LOGIN", "10/minute")
+    RATE_LIMIT_SIGNUP: str = os.getenv("RATE_LIMIT_SIGNUP", "20/hour")
+    RATE_LIMIT_UPLOAD: str = os.getenv("RATE_LIMIT_UPLOAD", "30/minute")
+    # Requests beyond MAX_CONCURRENT_REQUESTS wait up to CONCURRENCY_QUEUE_TIMEOUT seconds, then get a 503;
+    # keep it at or below the pool size plus overflow so requests are shed before they queue on the pool
+    MAX_CONCURRENT_REQUESTS: int = int(os.getenv("MAX_CONCURRENT_REQUESTS", 15))
+    CONCURRENCY_QUEUE_TIMEOUT: float = float(os.getenv("CONCURRENCY_QUEUE_TIMEOUT", 0.5))
+    # Live updates over /ws: changes are coalesced per post and flushed every EVENTS_FLUSH_SECONDS; a redis://
+    # EVENTS_BROKER_URL relays them between workers
+    EVENTS_BROKER_URL: str = os.getenv("EVENTS_BROKER_URL", os.getenv("CACHE_URL", "memory://"))
+    EVENTS_FLUSH_SECONDS: float = float(os.getenv("EVENTS_FLUSH_SECONDS", 0.5))
+    WS_MAX_SUBSCRIPTIONS: int = int(os.getenv("WS_MAX_SUBSCRIPTIONS", 200))
+    # /posts/trending ranks the TRENDING_TOP_K highest scores; they are re-decayed every TRENDING_REDECAY_SECONDS
+    # (0 leaves it to a scheduled "python -m services.trending")
+    TRENDING_TOP_K: int = int(os.getenv("TRENDING_TOP_K", 1000))
+    TRENDING_REDECAY_SECONDS: int = int(os.getenv("TRENDING_REDECAY_SECONDS", 300))
+    # Soft-deleted posts and accounts are purged PURGE_BATCH_SIZE rows per statement, checking every
+    # PURGE_INTERVAL_SECONDS when idle (0 leaves it to a scheduled "python -m services.purge")
+    PURGE_BATCH_SIZE: int = int(os.getenv("PURGE_BATCH_SIZE", 1000))
+    PURGE_INTERVAL_SECONDS: int = int(os.getenv("PURGE_INTERVAL_SECONDS", 30))
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
+    UPLOAD_MAX_BYTES: int = int(os.getenv("UPLOAD_MAX_BYTES", 10 * 1024 * 1024))
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", 2))
+    # Behind nginx, e.g. "/protected-uploads/": Python only sends headers and nginx streams the file
+    UPLOADS_ACCEL_REDIRECT: str = os.getenv("UPLOADS_ACCEL_REDIRECT", "")
 
 
 settings = Settings()
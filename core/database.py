@@ -1,12 +1,71 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from core.config import settings
+from core.instrumentation import instrument_engine
+from core.metrics import DB_POOL_CHECKOUT_WAIT, observe_pool
 
-URL_DATABASE = settings.DATABASE_URL
+# Plain URLs from .env are mapped to their asyncio driver (asyncpg for Postgres, aiosqlite for tests)
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
 
-engine = create_engine(URL_DATABASE)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def async_url(url: str):
+    url = make_url(url)
+    if url.drivername in ASYNC_DRIVERS:
+        url = url.set(drivername=ASYNC_DRIVERS[url.drivername])
+    return url
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    # Records how long each checkout waited, labelled with the pool_logging_name given to the engine
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(self._orig_logging_name).observe(time.perf_counter() - start)
+
+
+def enforce_sqlite_foreign_keys(engine):
+    # SQLite ignores REFERENCES ... ON DELETE CASCADE unless every connection opts in
+    @event.listens_for(engine.sync_engine, "connect")
+    def enable_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def make_engine(url: str, name: str):
+    url = async_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # In-memory SQLite lives in a single connection, there is no pool to tune
+        engine = create_async_engine(url)
+    else:
+        engine = create_async_engine(url, poolclass=InstrumentedPool, pool_logging_name=name,
+                                     pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW,
+                                     pool_timeout=settings.DB_POOL_TIMEOUT, pool_recycle=settings.DB_POOL_RECYCLE,
+                                     pool_pre_ping=settings.DB_POOL_PRE_PING)
+        observe_pool(engine, name)
+    if url.get_backend_name() == "sqlite":
+        enforce_sqlite_foreign_keys(engine)
+    instrument_engine(engine)
+    return engine
+
+
+def pool_status(engine) -> dict:
+    pool = engine.sync_engine.pool
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return {}
+    return {"size": pool.size(), "checked_out": pool.checkedout(), "overflow": max(pool.overflow(), 0)}
+
+
+URL_DATABASE = async_url(settings.DATABASE_URL)
+
+engine = make_engine(settings.DATABASE_URL, "primary")
+
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
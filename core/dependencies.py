@@ -1,9 +1,19 @@
+from starlette.requests import Request
 from core.database import SessionLocal
+from core.replicas import mark_write, replicas, wrote_recently
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db(request: Request):
+    async with SessionLocal() as db:
+        yield db
+        await mark_write(request)
+
+
+async def get_read_db(request: Request):
+    # Read-only endpoints go to a replica unless none is in sync or this client has just written
+    sessionmaker = None
+    if replicas.engines and not await wrote_recently(request):
+        sessionmaker = replicas.pick()
+    request.state.read_replica = sessionmaker is not None
+    async with (sessionmaker or SessionLocal)() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,75 @@
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from starlette.types import ASGIApp, Receive, Scope, Send
+from core.config import settings
+from core.metrics import HTTP_REQUEST_DURATION, DB_STATEMENTS_PER_REQUEST, DB_TIME_PER_REQUEST
+
+logger = logging.getLogger('uvicorn.error')
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_time")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+
+
+# Mutated in place, so statements run from threadpool or greenlet copies of the context still add up
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = request_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_time += elapsed
+
+
+class InstrumentationMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+        elapsed = None
+
+        async def send_wrapper(message):
+            nonlocal status_code, elapsed
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                # Stop the clock once the body is out, background tasks run after this point
+                elapsed = time.perf_counter() - start
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stats.reset(token)
+            # The router stores the matched route in the scope; mounted apps only leave their root_path
+            route = scope.get("route")
+            template = route.path if route is not None else scope.get("root_path") or "unmatched"
+            HTTP_REQUEST_DURATION.labels(scope["method"], template, status_code).observe(
+                elapsed if elapsed is not None else time.perf_counter() - start)
+            DB_STATEMENTS_PER_REQUEST.labels(template).observe(stats.statements)
+            DB_TIME_PER_REQUEST.labels(template).observe(stats.db_time)
+            if stats.statements > settings.N_PLUS_ONE_THRESHOLD:
+                logger.warning("N+1 suspect: %s %s issued %d SQL statements (%.1f ms in the database)",
+                               scope["method"], template, stats.statements, stats.db_time * 1000)
@@ -0,0 +1,25 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+DB_POOL_SIZE = Gauge("db_pool_size", "Connections kept open by the pool", ["pool"])
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently checked out", ["pool"])
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond the pool size", ["pool"])
+DB_POOL_CHECKOUT_WAIT = Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection",
+                                  ["pool"], buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30))
+
+
+def observe_pool(engine, name: str):
+    # Read through engine.sync_engine on every scrape, the pool object is replaced on dispose()
+    DB_POOL_SIZE.labels(name).set_function(lambda: engine.sync_engine.pool.size())
+    DB_POOL_CHECKED_OUT.labels(name).set_function(lambda: engine.sync_engine.pool.checkedout())
+    DB_POOL_OVERFLOW.labels(name).set_function(lambda: max(engine.sync_engine.pool.overflow(), 0))
+
+HTTP_REQUEST_DURATION = Histogram("http_request_duration_seconds", "Request latency by route template",
+                                  ["method", "route", "status"])
+DB_STATEMENTS_PER_REQUEST = Histogram("db_statements_per_request", "SQL statements issued per request", ["route"],
+                                      buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144))
+DB_TIME_PER_REQUEST = Histogram("db_time_per_request_seconds", "Time spent executing SQL per request", ["route"])
+RATE_LIMITED_REQUESTS = Counter("rate_limited_requests_total", "Requests rejected by a rate limit policy", ["policy"])
+SHED_REQUESTS = Counter("shed_requests_total", "Requests turned away by the concurrency limiter")
+WS_CONNECTIONS = Gauge("ws_connections", "Open live update WebSocket connections")
+USER_CACHE_HITS = Counter("user_cache_hits_total", "Authenticated requests served from the user cache")
+USER_CACHE_MISSES = Counter("user_cache_misses_total", "Authenticated requests that had to load the user")
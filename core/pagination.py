@@ -0,0 +1,47 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, Query
+from sqlalchemy import tuple_
+from starlette import status
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class PageParams:
+    def __init__(self, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                 cursor: Optional[str] = Query(None)):
+        self.limit = limit
+        self.cursor = decode_cursor(cursor) if cursor else None
+
+
+def encode_cursor(create_date: datetime, row_id: int) -> str:
+    raw = json.dumps([create_date.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        create_date, row_id = json.loads(raw)
+        return datetime.fromisoformat(create_date), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def keyset(query, date_column, id_column, page: PageParams):
+    # Newest first; (create_date, id) is unique so rows are never skipped or repeated between pages
+    if page.cursor:
+        query = query.filter(tuple_(date_column, id_column) < tuple_(*page.cursor))
+    return query.order_by(date_column.desc(), id_column.desc()).limit(page.limit + 1)
+
+
+def paginate(items, page: PageParams):
+    # One extra row is fetched to know whether there is a next page without a COUNT(*)
+    next_cursor = None
+    if len(items) > page.limit:
+        items = items[:page.limit]
+        next_cursor = encode_cursor(items[-1].create_date, items[-1].id)
+    return items, next_cursor
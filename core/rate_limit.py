@@ -0,0 +1,160 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Tuple
+from fastapi import Depends, HTTPException, Request
+from starlette import status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from core.cache import is_redis_url, redis_client
+from core.config import settings
+from core.metrics import RATE_LIMITED_REQUESTS, SHED_REQUESTS
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    count, _, period = rate.partition("/")
+    try:
+        return int(count), PERIODS[period.strip()]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate limit {rate!r}, expected e.g. '10/minute'")
+
+
+class MemoryBucketStore:
+    # Per-worker buckets; idle ones are evicted least recently used first
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._buckets: OrderedDict = OrderedDict()
+
+    async def take(self, key: str, capacity: int, refill_rate: float) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill_rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / refill_rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_entries:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+# Refill and take in one atomic step on the server clock, so every worker sees the same bucket
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBucketStore:
+    def __init__(self, client):
+        self.client = client
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    async def take(self, key: str, capacity: int, refill_rate: float) -> float:
+        wait = await self._take(keys=[key], args=[capacity, refill_rate])
+        return float(wait.decode() if isinstance(wait, bytes) else wait)
+
+
+def make_bucket_store(url: str, max_entries: int):
+    if url.startswith("memory://"):
+        return MemoryBucketStore(max_entries)
+    if is_redis_url(url):
+        return RedisBucketStore(redis_client(url))
+    raise ValueError(f"Unsupported RATE_LIMIT_URL: {url}")
+
+
+bucket_store = make_bucket_store(settings.RATE_LIMIT_URL, settings.CACHE_MAX_ENTRIES)
+
+
+class RateLimit:
+    # A token bucket per client: bursts up to the full count, then the count spread evenly over the period.
+    # Used as a dependency it limits by client IP (uvicorn --proxy-headers resolves it behind a proxy);
+    # by_user() limits by the authenticated user instead.
+    def __init__(self, policy: str, rate: str):
+        self.policy = policy
+        self.capacity, period = parse_rate(rate)
+        self.refill_rate = self.capacity / period
+
+    async def check(self, identity: str):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        wait = await bucket_store.take(f"ratelimit:{self.policy}:{identity}", self.capacity, self.refill_rate)
+        if wait > 0:
+            RATE_LIMITED_REQUESTS.labels(self.policy).inc()
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many requests",
+                                headers={"Retry-After": str(math.ceil(wait))})
+
+    async def __call__(self, request: Request):
+        await self.check("ip:" + (request.client.host if request.client else "unknown"))
+
+    def by_user(self, current_user_dependency):
+        async def dependency(current_user=Depends(current_user_dependency)):
+            await self.check(f"user:{current_user.id}")
+
+        return dependency
+
+
+login_limit = RateLimit("login", settings.RATE_LIMIT_LOGIN)
+signup_limit = RateLimit("signup", settings.RATE_LIMIT_SIGNUP)
+upload_limit = RateLimit("upload", settings.RATE_LIMIT_UPLOAD)
+
+
+class ConcurrencyLimitMiddleware:
+    # Admission control in front of the app: once max_concurrent requests are in flight, newcomers wait at most
+    # queue_timeout for a slot and are then answered 503 instead of piling up on the connection pool
+    def __init__(self, app: ASGIApp, max_concurrent: int, queue_timeout: float,
+                 exempt_paths: Tuple[str, ...] = ("/metrics", "/uploads")):
+        self.app = app
+        self.queue_timeout = queue_timeout
+        self.exempt_paths = exempt_paths
+        self._slots = asyncio.Semaphore(max_concurrent) if max_concurrent > 0 else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if self._slots is None or scope["type"] != "http" or scope["path"].startswith(self.exempt_paths):
+            return await self.app(scope, receive, send)
+
+        try:
+            if self._slots.locked():
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            else:
+                await self._slots.acquire()
+        except asyncio.TimeoutError:
+            SHED_REQUESTS.inc()
+            response = JSONResponse({"detail": "Server busy, try again later"},
+                                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"})
+            return await response(scope, receive, send)
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._slots.release()
+
+        async def send_wrapper(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                # The response is out; background tasks that run after it don't hold a slot
+                release()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            release()
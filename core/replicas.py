@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+import itertools
+import logging
+import math
+from typing import List, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from starlette.requests import Request
+from core.cache import cache_backend
+from core.config import settings
+from core.database import make_engine
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Zero while the replica has replayed everything it received, so an idle primary does not read as lag
+PG_REPLICA_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaSet:
+    # Round-robins reads over the replicas whose last measured lag is within max_lag
+    def __init__(self, engines: list, max_lag: float):
+        self.engines = engines
+        self.max_lag = max_lag
+        self.sessionmakers = [async_sessionmaker(bind=e, autoflush=False, expire_on_commit=False) for e in engines]
+        self.lag: List[float] = [0.0] * len(engines)
+        self._turn = itertools.count()
+
+    def pick(self) -> Optional[async_sessionmaker]:
+        healthy = [i for i, lag in enumerate(self.lag) if lag <= self.max_lag]
+        if not healthy:
+            return None
+        return self.sessionmakers[healthy[next(self._turn) % len(healthy)]]
+
+    async def measure(self, engine) -> float:
+        async with engine.connect() as conn:
+            if engine.dialect.name == "postgresql":
+                return float(await conn.scalar(PG_REPLICA_LAG))
+            # Stand-ins without replication (SQLite in development) only have to answer
+            await conn.execute(text("SELECT 1"))
+            return 0.0
+
+    async def refresh(self):
+        for i, engine in enumerate(self.engines):
+            try:
+                self.lag[i] = await asyncio.wait_for(self.measure(engine), settings.DB_HEALTH_TIMEOUT)
+            except Exception:
+                logger.warning("Replica %s unreachable, reads fall back to the primary", engine.url.host or i)
+                self.lag[i] = math.inf
+
+    async def monitor(self, interval: float):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(interval)
+
+    async def dispose(self):
+        for engine in self.engines:
+            await engine.dispose()
+
+
+def _session_key(request: Request) -> Optional[str]:
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return None
+    return "rw:" + hashlib.sha1(authorization.encode()).hexdigest()
+
+
+async def mark_write(request: Request):
+    # The token's next reads go to the primary until the replicas have had time to catch up
+    key = _session_key(request)
+    if key and request.method not in SAFE_METHODS:
+        await cache_backend.set(key, "1", settings.READ_AFTER_WRITE_SECONDS)
+
+
+async def wrote_recently(request: Request) -> bool:
+    key = _session_key(request)
+    return key is not None and await cache_backend.get(key) is not None
+
+
+replicas = ReplicaSet([make_engine(url.strip(), f"replica{i}")
+                       for i, url in enumerate(settings.DATABASE_REPLICA_URLS.split(",")) if url.strip()],
+                      settings.REPLICA_MAX_LAG_SECONDS)
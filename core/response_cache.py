@@ -0,0 +1,78 @@
+import functools
+import hashlib
+import inspect
+import json
+import math
+from typing import Callable, List
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from core.cache import cache_backend
+from core.config import settings
+from core.replicas import replicas
+
+
+class ResponseCache:
+    # Keys embed the current version of every tag, so invalidating a tag is a single INCR and
+    # the stale entries simply age out of the backend
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def key(self, request: Request, tags: List[str], user_id=None) -> str:
+        versions = [await self.backend.get(f"tag:{tag}") or "0" for tag in tags]
+        raw = json.dumps([request.url.path, sorted(request.query_params.multi_items()), user_id, tags, versions])
+        return "response:" + hashlib.sha1(raw.encode()).hexdigest()
+
+    async def invalidate(self, *tags: str):
+        for tag in tags:
+            await self.backend.incr(f"tag:{tag}")
+            if replicas.engines:
+                await self.backend.set(f"tag:{tag}:settling", "1", math.ceil(settings.REPLICA_MAX_LAG_SECONDS))
+
+    async def settling(self, tags: List[str]) -> bool:
+        # A replica may still be serving data from before the last invalidation of one of the tags
+        for tag in tags:
+            if await self.backend.get(f"tag:{tag}:settling") is not None:
+                return True
+        return False
+
+
+response_cache = ResponseCache(cache_backend)
+
+
+def cached(ttl: int, tags: Callable[..., List[str]], vary_on_user: bool = False):
+    # Endpoint results are stored as JSON and answered with a strong ETag; a matching If-None-Match gets
+    # a 304. tags() receives the endpoint's keyword arguments. Responses bypass response_model, so
+    # decorated endpoints should return the response model instance itself.
+    def decorator(endpoint):
+        signature = inspect.signature(endpoint)
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, cache_request: Request, **kwargs):
+            user_id = kwargs["current_user"].id if vary_on_user else None
+            endpoint_tags = tags(**kwargs)
+            key = await response_cache.key(cache_request, endpoint_tags, user_id)
+            body = await response_cache.backend.get(key)
+            if body is None:
+                result = await endpoint(*args, **kwargs)
+                if isinstance(result, BaseModel):
+                    body = result.model_dump_json()
+                else:
+                    body = json.dumps(jsonable_encoder(result), separators=(",", ":"))
+                # Otherwise a lagging replica could put pre-write data under the new tag version, where every
+                # client, the writer included, would read it until the entry expires
+                if not (getattr(cache_request.state, "read_replica", False)
+                        and await response_cache.settling(endpoint_tags)):
+                    await response_cache.backend.set(key, body, ttl)
+
+            headers = {"etag": f'"{hashlib.sha1(body.encode()).hexdigest()}"', "cache-control": "private, no-cache"}
+            if headers["etag"] in cache_request.headers.get("if-none-match", ""):
+                return Response(status_code=304, headers=headers)
+            return Response(body, media_type="application/json", headers=headers)
+
+        wrapper.__signature__ = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter("cache_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)])
+        return wrapper
+
+    return decorator
@@ -0,0 +1,38 @@
+import os
+import re
+from typing import Optional
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+# Originals and their renditions are named after the content hash, so their bytes can never change
+CONTENT_ADDRESSED = re.compile(r"^[0-9a-f]{64}(_[a-z]+)?$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+
+
+class UploadFiles(StaticFiles):
+    def __init__(self, *, accel_redirect_prefix: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.accel_redirect_prefix = accel_redirect_prefix
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        stem = os.path.splitext(os.path.basename(full_path))[0]
+        headers = {"cache-control": REVALIDATE}
+        if CONTENT_ADDRESSED.match(stem):
+            headers = {"cache-control": IMMUTABLE, "etag": f'"{stem}"'}
+
+        # FileResponse handles Range/If-Range and uses the server's zero-copy pathsend extension when available
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+
+        if self.accel_redirect_prefix:
+            relative_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+            headers = {key: value for key, value in response.headers.items()
+                       if key in ("cache-control", "etag", "last-modified", "content-type", "accept-ranges")}
+            headers["x-accel-redirect"] = self.accel_redirect_prefix.rstrip("/") + "/" + relative_path
+            return Response(status_code=status_code, headers=headers)
+        return response
@@ -0,0 +1,27 @@
+from starlette import status
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Room for the other form fields and the multipart boundaries around the file
+FORM_OVERHEAD_BYTES = 1024 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    # Multipart bodies announcing more than max_bytes are refused before the form parser spools them to disk.
+    # Chunked uploads carry no Content-Length; LocalStorage.save still stops those at max_bytes while streaming.
+    def __init__(self, app: ASGIApp, max_bytes: int, form_overhead: int = FORM_OVERHEAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.form_overhead = form_overhead
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            length = headers.get("content-length", "")
+            if (headers.get("content-type", "").startswith("multipart/form-data") and length.isdigit()
+                    and int(length) > self.max_bytes + self.form_overhead):
+                response = JSONResponse({"detail": f"File exceeds the {self.max_bytes} bytes limit"},
+                                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+                return await response(scope, receive, send)
+        await self.app(scope, receive, send)
@@ -1,27 +1,67 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import ORJSONResponse
 
+from core.config import settings
 from core.database import engine
+from core.instrumentation import InstrumentationMiddleware
+from core.rate_limit import ConcurrencyLimitMiddleware
+from core.replicas import replicas
+from core.static import UploadFiles
+from core.uploads import UploadSizeLimitMiddleware
 from models import models
-from routes import auth, users, posts, comments, likes
+from services import images, purge, trending
+from services.events import event_bus
+from services.passwords import password_hasher
+from routes import auth, users, posts, comments, likes, health, ws
 from starlette import status
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import make_asgi_app
 
 import logging
 
 logger = logging.getLogger('uvicorn.error')
 logger.setLevel(logging.DEBUG)
 
-app = FastAPI(title="Watchable")
 
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    await event_bus.start()
+    jobs = []
+    if replicas.engines:
+        jobs.append(asyncio.create_task(replicas.monitor(settings.REPLICA_LAG_CHECK_SECONDS)))
+    if settings.TRENDING_REDECAY_SECONDS > 0:
+        jobs.append(asyncio.create_task(trending.run(settings.TRENDING_REDECAY_SECONDS, settings.TRENDING_TOP_K)))
+    if settings.PURGE_INTERVAL_SECONDS > 0:
+        jobs.append(asyncio.create_task(purge.run(settings.PURGE_INTERVAL_SECONDS, settings.PURGE_BATCH_SIZE)))
+    yield
+    for job in jobs:
+        job.cancel()
+    await event_bus.stop()
+    password_hasher.shutdown()
+    images.shutdown()
+    await replicas.dispose()
+    await engine.dispose()
+
+
+app = FastAPI(title="Watchable", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(posts.router)
 app.include_router(comments.router)
 app.include_router(likes.router)
+app.include_router(health.router)
+app.include_router(ws.router)
 
+# Inside CORS so shed requests still carry the CORS headers the browser needs to read the 503
+app.add_middleware(ConcurrencyLimitMiddleware, max_concurrent=settings.MAX_CONCURRENT_REQUESTS,
+                   queue_timeout=settings.CONCURRENCY_QUEUE_TIMEOUT)
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=settings.UPLOAD_MAX_BYTES)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Permite Angular en desarrollo
@@ -29,9 +69,15 @@ app.add_middleware(
     allow_methods=["*"],  # Permite todos los métodos (GET, POST, PUT, DELETE)
     allow_headers=["*"],  # Permite todos los headers
 )
+app.add_middleware(InstrumentationMiddleware)
+
+# Prometheus scrape endpoint
+app.mount("/metrics", make_asgi_app(), name="metrics")
 
 # Servir archivos estáticos desde la carpeta "uploads"
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+app.mount("/uploads", UploadFiles(directory=settings.UPLOAD_DIR,
+                                  accel_redirect_prefix=settings.UPLOADS_ACCEL_REDIRECT or None), name="uploads")
 
 @app.get("/", status_code=status.HTTP_200_OK)
 async def root():
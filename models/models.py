@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import (Column, Float, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint, Index, DDL, event,
+                        func)
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from core.database import Base
 
+event.listen(Base.metadata, "before_create",
+             DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+
 
 class User(Base):
     __tablename__ = "users"
@@ -14,12 +18,27 @@ class User(Base):
     password = Column(String(128), nullable=False)
     profile_picture = Column(String(256), nullable=True)
     description = Column(Text, nullable=True)
-    create_date = Column(DateTime, default=datetime.now())
-
-    # Relations: a user can have many posts and comments
-    posts = relationship("Post", back_populates="author")
-    comments = relationship("Comment", back_populates="author")
-    likes = relationship("Like", back_populates="user")
+    create_date = Column(DateTime, default=datetime.now)
+    # Soft delete: set when the account is closed, hidden from every read until services/purge.py removes the rows
+    deleted_at = Column(DateTime, nullable=True)
+
+    # Trigram indexes serving the substring/fuzzy user search on Postgres (see services/search.py), plus a
+    # btree for queries too short to have a trigram, which only match as a username prefix
+    __table_args__ = (
+        Index("ix_users_username_trgm", "username", postgresql_using="gin",
+              postgresql_ops={"username": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_users_full_name_trgm", "full_name", postgresql_using="gin",
+              postgresql_ops={"full_name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_users_username_lower_prefix", func.lower(username).label("username_lower"),
+              postgresql_ops={"username_lower": "text_pattern_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_users_deleted_at", "deleted_at"),
+    )
+
+    # Relations: a user can have many posts and comments. Children go through ON DELETE CASCADE;
+    # passive_deletes keeps the ORM from loading them just to delete the parent.
+    posts = relationship("Post", back_populates="author", cascade="all, delete", passive_deletes=True)
+    comments = relationship("Comment", back_populates="author", cascade="all, delete", passive_deletes=True)
+    likes = relationship("Like", back_populates="user", cascade="all, delete", passive_deletes=True)
 
 
 class Post(Base):
@@ -29,13 +48,26 @@ class Post(Base):
     title = Column(Text, nullable=False)
     body = Column(Text, nullable=False)
     image = Column(String(256), nullable=True)
-    create_date = Column(DateTime, default=datetime.now())
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    create_date = Column(DateTime, default=datetime.now)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # Denormalized counters kept in sync by the like/comment write paths (see services/counters.py)
+    like_count = Column(Integer, nullable=False, default=0, server_default="0")
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Time-decayed popularity, materialized by services/trending.py
+    trending_score = Column(Float, nullable=False, default=0, server_default="0")
+    # Soft delete: hidden from every read at once, the post and its likes and comments are purged in the background
+    deleted_at = Column(DateTime, nullable=True)
+
+    # Indexes backing the (create_date, id) keyset pagination of the feeds and the trending order
+    __table_args__ = (Index("ix_posts_create_date_id", "create_date", "id"),
+                      Index("ix_posts_user_id_create_date", "user_id", "create_date"),
+                      Index("ix_posts_trending_score_id", "trending_score", "id"),
+                      Index("ix_posts_deleted_at", "deleted_at"),)
 
     # Relations: a post belongs to one user and can have many comments
     author = relationship("User", back_populates="posts")
-    comments = relationship("Comment", back_populates="post")
-    likes = relationship("Like", back_populates="post")
+    comments = relationship("Comment", back_populates="post", cascade="all, delete", passive_deletes=True)
+    likes = relationship("Like", back_populates="post", cascade="all, delete", passive_deletes=True)
 
 
 class Comment(Base):
@@ -43,9 +75,12 @@ class Comment(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     body = Column(Text, nullable=False)
-    create_date = Column(DateTime, default=datetime.now())
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
+    create_date = Column(DateTime, default=datetime.now)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
+
+    __table_args__ = (Index("ix_comments_post_id_create_date", "post_id", "create_date"),
+                      Index("ix_comments_user_id", "user_id"),)
 
     # Relations: a comment belongs to a user and a post
     author = relationship("User", back_populates="comments")
@@ -56,10 +91,12 @@ class Like(Base):
     __tablename__ = "likes"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
 
-    __table_args__ = (UniqueConstraint('user_id', 'post_id', name='uix_user_post'),)
+    # uix_user_post serves lookups by user; cascades and purges by post need their own index
+    __table_args__ = (UniqueConstraint('user_id', 'post_id', name='uix_user_post'),
+                      Index("ix_likes_post_id", "post_id"),)
 
     # Relations: A post can have many likes
     user = relationship("User", back_populates="likes")
@@ -1,14 +1,17 @@
 from datetime import timedelta, datetime
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated
 from models import models
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from jose import jwt, JWTError
 from schemas.user_schemas import Token
 from core.dependencies import get_db
 from core.config import settings
+from core.rate_limit import login_limit
+from services.passwords import password_hasher
+from services.user_cache import user_cache
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -16,14 +19,13 @@ SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MIN = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 
-@router.post("/token", response_model=Token, status_code=status.HTTP_200_OK)
+@router.post("/token", response_model=Token, status_code=status.HTTP_200_OK, dependencies=[Depends(login_limit)])
 async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-                                 db: Session = Depends(get_db)):
-    user = authenticate_user(form_data.username, form_data.password, db)
+                                 db: AsyncSession = Depends(get_db)):
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="The user does not exist")
     token = create_access_token(user.username, user.id, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MIN))
@@ -31,32 +33,47 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
     return {"access_token": token, "token_type": "bearer"}
 
 
-def authenticate_user(username: str, password: str, db):
-    user = db.query(models.User).filter(models.User.username == username).first()
+async def authenticate_user(username: str, password: str, db: AsyncSession):
+    user = await db.scalar(select(models.User).where(models.User.username == username,
+                                                     models.User.deleted_at.is_(None)))
     if not user:
         return False
-    if not bcrypt_context.verify(password, user.password):
+    verified, new_hash = await password_hasher.verify(password, user.password)
+    if not verified:
         return False
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
     return user
 
 
 def create_access_token(username: str, user_id: int, expires_delta: timedelta):
     encode = {'sub': username, 'id': user_id}
-    expires = datetime.utcnow() + expires_delta
-    encode.update({"exp": expires})
+    issued = datetime.utcnow()
+    encode.update({"iat": issued, "exp": issued + expires_delta})
     return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)], db: Session = Depends(get_db)):
+async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)], db: AsyncSession = Depends(get_db)):
+    return await user_from_token(token, db)
+
+
+async def user_from_token(token: str, db: AsyncSession):
+    # Also used by the WebSocket endpoint, which authenticates once per connection with a short-lived session
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get('sub')
         user_id: int = payload.get('id')
+        issued_at: int = payload.get('iat', 0)
         if username is None or user_id is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate user")
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate user")
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if user is None:
+    user = await user_cache.get(user_id, issued_at)
+    if user is not None:
+        return user
+    user = await db.get(models.User, user_id)
+    if user is None or user.deleted_at is not None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    await user_cache.set(user, issued_at)
     return user
@@ -1,45 +1,99 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
 from starlette import status
 from models import models
-from schemas.comment_schemas import CommentCreate, Comment
-from core.dependencies import get_db
+from schemas.comment_schemas import Comment, CommentCreate, CommentPage, CommentCreated, CommentBatch
+from schemas.common_schemas import Message
+from core.dependencies import get_db, get_read_db
+from core.pagination import PageParams, keyset, paginate
+from core.response_cache import cached, response_cache
 from routes.auth import get_current_user
+from services.counters import bump
+from services.events import event_bus
 from typing import Annotated, List
 
 router = APIRouter(prefix="/comments", tags=["comments"])
 
 
-@router.post("/create_comment", status_code=status.HTTP_201_CREATED)
-def create_comment(comment_data: CommentCreate, current_user: Annotated[dict, Depends(get_current_user)],
-                   db: Session = Depends(get_db)):
+def visible_comments():
+    # The author is joined anyway to render the comment; comments of closed accounts and deleted posts stay hidden
+    # until the purge worker removes them
+    return select(models.Comment).join(models.Comment.author).join(models.Comment.post).options(
+        contains_eager(models.Comment.author)).where(models.User.deleted_at.is_(None), models.Post.deleted_at.is_(None))
+
+
+@router.post("/create_comment", response_model=CommentCreated, status_code=status.HTTP_201_CREATED)
+async def create_comment(comment_data: CommentCreate, current_user: Annotated[dict, Depends(get_current_user)],
+                         db: AsyncSession = Depends(get_db)):
+    author_id = await bump(db, comment_data.post_id, models.Post.comment_count, 1)
+    if author_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
     new_comment = models.Comment(body=comment_data.body, user_id=current_user.id, post_id=comment_data.post_id)
 
     db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment, ["author"])
+    await db.commit()
+    await db.refresh(new_comment, ["author"])
+    await response_cache.invalidate(f"post:{comment_data.post_id}:comments", f"user:{author_id}:posts")
+    await event_bus.publish(comment_data.post_id, comment=Comment.model_validate(new_comment).model_dump(mode="json"))
 
     return {"message": "Comment created successfully", "comment": new_comment}
 
 
-@router.delete("/{comment_id}")
-def delete_comment(comment_id: int, current_user: Annotated[dict, Depends(get_current_user)],
-                   db: Session = Depends(get_db)):
-    comment = db.query(models.Comment).filter(models.Comment.id == comment_id,
-                                              models.Comment.user_id == current_user.id).first()
+@router.delete("/{comment_id}", response_model=Message)
+async def delete_comment(comment_id: int, current_user: Annotated[dict, Depends(get_current_user)],
+                         db: AsyncSession = Depends(get_db)):
+    comment = await db.scalar(select(models.Comment).where(models.Comment.id == comment_id,
+                                                           models.Comment.user_id == current_user.id))
 
     if not comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
-    db.delete(comment)
-    db.commit()
+    await db.delete(comment)
+    author_id = await bump(db, comment.post_id, models.Post.comment_count, -1)
+    await db.commit()
+    # No author when the post was deleted meanwhile: its feeds were invalidated by the deletion
+    await response_cache.invalidate(f"post:{comment.post_id}:comments",
+                                    *([f"user:{author_id}:posts"] if author_id is not None else []))
+    await event_bus.publish(comment.post_id, deleted_comment=comment_id)
 
     return {"message": "Comment eliminated successfully"}
 
 
-@router.get("/{post_id}", response_model=List[Comment])
-def get_comments(post_id: int, db: Session = Depends(get_db)):
+# Declared before /{post_id} so "batch" is not parsed as a post id
+@router.get("/batch", response_model=CommentBatch)
+@cached(ttl=60, tags=lambda post_ids, **_: [f"post:{post_id}:comments" for post_id in sorted(set(post_ids))])
+async def get_comments_batch(post_ids: List[int] = Query(..., min_length=1, max_length=50),
+                             limit: int = Query(3, ge=1, le=20), db: AsyncSession = Depends(get_read_db)):
+    # Latest comments of every visible post in one windowed query instead of one request per post. Hidden comments
+    # are filtered inside the window, otherwise they would take up the ranks of visible ones
+    post_ids = sorted(set(post_ids))
+    ranked = select(models.Comment.id, func.row_number().over(
+        partition_by=models.Comment.post_id,
+        order_by=(models.Comment.create_date.desc(), models.Comment.id.desc())).label("rank")).join(
+        models.Comment.author).join(models.Comment.post).where(
+        models.Comment.post_id.in_(post_ids), models.User.deleted_at.is_(None),
+        models.Post.deleted_at.is_(None)).subquery()
+    query = visible_comments().join(ranked, ranked.c.id == models.Comment.id).where(
+        ranked.c.rank <= limit + 1).order_by(models.Comment.post_id, ranked.c.rank)
+
+    by_post = {post_id: [] for post_id in post_ids}
+    for comment in (await db.scalars(query)).all():
+        by_post[comment.post_id].append(comment)
+    page = PageParams(limit=limit, cursor=None)
+    posts = []
+    for post_id, comments in by_post.items():
+        comments, next_cursor = paginate(comments, page)
+        posts.append({"post_id": post_id, "comments": comments, "next_cursor": next_cursor})
+    return CommentBatch.model_validate({"posts": posts}, from_attributes=True)
+
+
+@router.get("/{post_id}", response_model=CommentPage)
+@cached(ttl=60, tags=lambda post_id, **_: [f"post:{post_id}:comments"])
+async def get_comments(post_id: int, page: PageParams = Depends(), db: AsyncSession = Depends(get_read_db)):
     #comments = db.query(models.Comment).filter(models.Comment.post_id == post_id).order_by(
     #    models.Comment.id.desc()).all()
-    comments = db.query(models.Comment).options(joinedload(models.Comment.author)).filter(
-        models.Comment.post_id == post_id).order_by(models.Comment.create_date.desc()).all()
-    return comments
+    query = visible_comments().where(models.Comment.post_id == post_id)
+    comments, next_cursor = paginate(
+        (await db.scalars(keyset(query, models.Comment.create_date, models.Comment.id, page))).all(), page)
+    return CommentPage.model_validate({"comments": comments, "next_cursor": next_cursor}, from_attributes=True)
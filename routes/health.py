@@ -0,0 +1,26 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+from core.config import settings
+from core.database import engine, pool_status
+from core.dependencies import get_db
+from core.replicas import replicas
+from schemas.common_schemas import DatabaseHealth
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/db", response_model=DatabaseHealth, status_code=status.HTTP_200_OK)
+async def database_health(db: AsyncSession = Depends(get_db)):
+    # Readiness probe: a worker that can't get a working connection in time should be taken out of rotation
+    try:
+        await asyncio.wait_for(db.execute(text("SELECT 1")), timeout=settings.DB_HEALTH_TIMEOUT)
+    except (asyncio.TimeoutError, SQLAlchemyError, OSError):
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database unavailable")
+
+    # Lag as of the last check; unreachable replicas report null
+    replica_lag = {f"replica{i}": lag if lag != float("inf") else None for i, lag in enumerate(replicas.lag)}
+    return {"status": "ok", "pool": pool_status(engine), "replica_lag": replica_lag}
@@ -1,41 +1,96 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 from models import models
-from schemas.like_schema import LikeCreate
+from schemas.common_schemas import Message
+from schemas.like_schema import LikeCreate, LikeCreated, LikeBatch, LikeBatchResult
 from core.dependencies import get_db
+from core.response_cache import response_cache
 from routes.auth import get_current_user
+from services.counters import bump, bump_many
+from services.events import event_bus
 from typing import Annotated
 
 router = APIRouter(prefix="/likes", tags=["likes"])
 
+# INSERT ... ON CONFLICT DO NOTHING is dialect specific
+DIALECT_INSERT = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
 
-@router.post("/likes")
+
+@router.post("/likes", response_model=LikeCreated)
 # post_id: int
-def like_post(like_data: LikeCreate, current_user: Annotated[dict, Depends(get_current_user)],
-              db: Session = Depends(get_db)):
+async def like_post(like_data: LikeCreate, current_user: Annotated[dict, Depends(get_current_user)],
+                    db: AsyncSession = Depends(get_db)):
     post_id = like_data.post_id
-    existing_like = db.query(models.Like).filter(models.Like.user_id == current_user.id,
-                                                 models.Like.post_id == post_id).first()
+    existing_like = await db.scalar(select(models.Like).where(models.Like.user_id == current_user.id,
+                                                              models.Like.post_id == post_id))
     if existing_like:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You already liked this post")
+    author_id = await bump(db, post_id, models.Post.like_count, 1)
+    if author_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
     new_like = models.Like(user_id=current_user.id, post_id=post_id)
 
     db.add(new_like)
-    db.commit()
-    db.refresh(new_like)
+    await db.commit()
+    await db.refresh(new_like)
+    await response_cache.invalidate(f"user:{author_id}:posts")
+    await event_bus.publish(post_id, likes=1)
 
     return {"message": "Like created successfully", "comment": new_like}
 
 
-@router.delete("/{like_id}")
-def unlike_post(like_id: int, current_user: Annotated[dict, Depends(get_current_user)],
-                db: Session = Depends(get_db)):
-    like = db.query(models.Like).filter(models.Like.id == like_id, models.Like.user_id == current_user.id).first()
+@router.delete("/{like_id}", response_model=Message)
+async def unlike_post(like_id: int, current_user: Annotated[dict, Depends(get_current_user)],
+                      db: AsyncSession = Depends(get_db)):
+    like = await db.scalar(select(models.Like).where(models.Like.id == like_id,
+                                                     models.Like.user_id == current_user.id))
 
     if not like:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Like not found")
-    db.delete(like)
-    db.commit()
+    await db.delete(like)
+    author_id = await bump(db, like.post_id, models.Post.like_count, -1)
+    await db.commit()
+    # No author when the post was deleted meanwhile: its feeds were invalidated by the deletion
+    if author_id is not None:
+        await response_cache.invalidate(f"user:{author_id}:posts")
+    await event_bus.publish(like.post_id, likes=-1)
 
     return {"message": "Like eliminated successfully"}
+
+
+@router.post("/batch", response_model=LikeBatchResult)
+async def like_batch(batch: LikeBatch, current_user: Annotated[dict, Depends(get_current_user)],
+                     db: AsyncSession = Depends(get_db)):
+    to_like, to_unlike = set(batch.like), set(batch.unlike)
+    if to_like & to_unlike:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="A post cannot be liked and unliked at once")
+
+    liked, unliked = [], []
+    if to_like:
+        # Posts already liked, deleted or that do not exist are skipped; only the rows actually inserted come back
+        insert = DIALECT_INSERT[db.bind.dialect.name]
+        liked = (await db.scalars(insert(models.Like).from_select(
+            [models.Like.user_id, models.Like.post_id],
+            select(literal(current_user.id), models.Post.id).where(models.Post.id.in_(to_like),
+                                                                  models.Post.deleted_at.is_(None))
+        ).on_conflict_do_nothing(index_elements=[models.Like.user_id, models.Like.post_id]).returning(
+            models.Like.post_id))).all()
+    if to_unlike:
+        unliked = (await db.scalars(delete(models.Like).where(
+            models.Like.user_id == current_user.id, models.Like.post_id.in_(to_unlike)).returning(
+            models.Like.post_id))).all()
+
+    authors = await bump_many(db, liked, models.Post.like_count, 1)
+    authors += await bump_many(db, unliked, models.Post.like_count, -1)
+    await db.commit()
+    await response_cache.invalidate(*{f"user:{author_id}:posts" for author_id in authors})
+    for post_id in liked:
+        await event_bus.publish(post_id, likes=1)
+    for post_id in unliked:
+        await event_bus.publish(post_id, likes=-1)
+
+    return {"liked": sorted(liked), "unliked": sorted(unliked)}
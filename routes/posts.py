@@ -1,96 +1,118 @@
-import os
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
-from sqlalchemy.orm import Session, joinedload
+from datetime import datetime
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, File, UploadFile, Form, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 from models import models
-from schemas.post_schemas import PostCreate
-from core.dependencies import get_db
+from schemas.common_schemas import Message
+from schemas.post_schemas import PostCreate, Post, PostPage, PostCreated, TrendingPage
+from core.config import settings
+from core.dependencies import get_db, get_read_db
+from core.pagination import PageParams, keyset, paginate
+from core.rate_limit import upload_limit
+from core.response_cache import cached, response_cache
+from services.feed import feed_query, hydrate_feed
+from services.images import process_image, sanitize, variant_urls
+from services.storage import storage
+from services.timeline import timeline
 from routes.auth import get_current_user
 from typing import Annotated
 
 router = APIRouter(prefix="/posts", tags=["posts"])
 
-UPLOAD_DIR = "uploads/post_images"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-
-@router.post("/create_post", status_code=status.HTTP_201_CREATED)
-async def create_post(title: str = Form(...), body: str = Form(...), image: UploadFile = File(None),
-                      current_user: dict = Depends(get_current_user),
-                      db: Session = Depends(get_db)):
+@router.post("/create_post", response_model=PostCreated, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(upload_limit.by_user(get_current_user))])
+async def create_post(background_tasks: BackgroundTasks, title: str = Form(...), body: str = Form(...),
+                      image: UploadFile = File(None), current_user: dict = Depends(get_current_user),
+                      db: AsyncSession = Depends(get_db)):
     image_path = None
     if image:
-        image_name = f"user_{current_user.id}_{image.filename}"
-        image_path = os.path.join(UPLOAD_DIR, image_name)
-
-        with open(image_path, "wb") as buffer:
-            buffer.write(await image.read())
-
-        image_path = image_path.replace("\\", "/")
+        image_path = (await storage.save(image, "post_images", prepare=sanitize)).path
+        background_tasks.add_task(process_image, image_path)
 
     new_post = models.Post(title=title, body=body, image=image_path, user_id=current_user.id)
     db.add(new_post)
-    db.commit()
-    db.refresh(new_post)
+    await db.commit()
+    await db.refresh(new_post)
+    await timeline.publish(db, new_post)
+    await response_cache.invalidate(f"user:{current_user.id}:posts")
+    new_post.imageVariants = variant_urls(new_post.image)
 
     return {"message": "Post created successfully", "post": new_post}
 
 
-@router.put("/{post_id}", status_code=status.HTTP_201_CREATED)
+@router.put("/{post_id}", response_model=Post, status_code=status.HTTP_201_CREATED)
 async def update_post(post_id: int, post_data: PostCreate, current_user: Annotated[dict, Depends(get_current_user)],
-                      db: Session = Depends(get_db)):
-    post = db.query(models.Post).filter(models.Post.id == post_id, models.Post.user_id == current_user.id).first()
+                      db: AsyncSession = Depends(get_db)):
+    post = await db.scalar(select(models.Post).where(models.Post.id == post_id, models.Post.deleted_at.is_(None),
+                                                     models.Post.user_id == current_user.id))
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
 
     post.body = post_data.body
-    db.commit()
-    db.refresh(post)
+    await db.commit()
+    await db.refresh(post)
+    await response_cache.invalidate(f"user:{current_user.id}:posts")
+    post.imageVariants = variant_urls(post.image)
 
     return post
 
 
-@router.delete("/{post_id}")
+@router.delete("/{post_id}", response_model=Message)
 async def delete_post(post_id: int, current_user: Annotated[dict, Depends(get_current_user)],
-                      db: Session = Depends(get_db)):
-    post = db.query(models.Post).filter(models.Post.id == post_id, models.Post.user_id == current_user.id).first()
+                      db: AsyncSession = Depends(get_db)):
+    post = await db.scalar(select(models.Post).where(models.Post.id == post_id, models.Post.deleted_at.is_(None),
+                                                     models.Post.user_id == current_user.id))
 
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
-    db.delete(post)
-    db.commit()
+    # Only flags the row, so the request costs the same however many likes and comments the post has;
+    # services/purge.py deletes it and its children in bounded batches
+    post.deleted_at = datetime.now()
+    post.trending_score = 0
+    await db.commit()
+    await timeline.retract(post)
+    await response_cache.invalidate(f"user:{current_user.id}:posts", f"post:{post_id}:comments", "trending")
 
     return {"message": "Post eliminated successfully"}
 
 
-@router.get("/all", status_code=status.HTTP_200_OK)
-async def get_all_posts(current_user: Annotated[dict, Depends(get_current_user)], db: Session = Depends(get_db)):
-    posts = db.query(models.Post).options(joinedload(models.Post.author)).filter(
-        models.Post.user_id != current_user.id).order_by(models.Post.create_date.desc()).all()
+@router.get("/all", response_model=PostPage, status_code=status.HTTP_200_OK)
+async def get_all_posts(current_user: Annotated[dict, Depends(get_current_user)], page: PageParams = Depends(),
+                        db: AsyncSession = Depends(get_read_db)):
+    posts, next_cursor = await timeline.read(db, current_user.id, page)
 
-    for post in posts:
-        post.likesCount = db.query(models.Like).filter(models.Like.post_id == post.id).count()
-        post.userLike = db.query(models.Like).filter(models.Like.post_id == post.id,
-                                                     models.Like.user_id == current_user.id).first()
-        post.commentsCount = db.query(models.Comment).filter(models.Comment.post_id == post.id).count()
+    return {"posts": posts, "next_cursor": next_cursor}
 
-    return {"posts": posts}
 
+@router.get("/trending", response_model=TrendingPage, status_code=status.HTTP_200_OK)
+# Scores move with every like, so the ranking is only cached briefly; deletions invalidate it right away
+@cached(ttl=30, tags=lambda **_: ["trending"], vary_on_user=True)
+async def get_trending_posts(current_user: Annotated[dict, Depends(get_current_user)],
+                             limit: int = Query(20, ge=1, le=100),
+                             offset: int = Query(0, ge=0, le=settings.TRENDING_TOP_K),
+                             db: AsyncSession = Depends(get_read_db)):
+    # Walks ix_posts_trending_score_id backwards; the stored scores are kept fresh by services/trending.py
+    limit = max(min(limit, settings.TRENDING_TOP_K - offset), 0)
+    query = feed_query(current_user.id).where(models.Post.trending_score > 0).order_by(
+        models.Post.trending_score.desc(), models.Post.id.desc()).offset(offset).limit(limit + 1)
+    posts = hydrate_feed(await db.execute(query)) if limit else []
+    next_offset = offset + limit if len(posts) > limit else None
 
-@router.get("/user/{user_id}", status_code=status.HTTP_200_OK)
-async def get_user_posts(current_user: Annotated[dict, Depends(get_current_user)], user_id: int, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
+    return TrendingPage.model_validate({"posts": posts[:limit], "next_offset": next_offset}, from_attributes=True)
+
+
+@router.get("/user/{user_id}", response_model=PostPage, status_code=status.HTTP_200_OK)
+@cached(ttl=30, tags=lambda user_id, **_: [f"user:{user_id}:posts"], vary_on_user=True)
+async def get_user_posts(current_user: Annotated[dict, Depends(get_current_user)], user_id: int,
+                         page: PageParams = Depends(), db: AsyncSession = Depends(get_read_db)):
+    user = await db.get(models.User, user_id)
+    if not user or user.deleted_at is not None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
     # posts = db.query(models.Post).filter(models.Post.author == user_id).order_by(models.Post.create_date.desc()).all()
-    posts = db.query(models.Post).options(joinedload(models.Post.author)).filter(
-        models.Post.user_id == user.id).order_by(models.Post.create_date.desc()).all()
-
-    for post in posts:
-        post.likesCount = db.query(models.Like).filter(models.Like.post_id == post.id).count()
-        post.userLike = db.query(models.Like).filter(models.Like.post_id == post.id,
-                                                     models.Like.user_id == current_user.id).first()
-        post.commentsCount = db.query(models.Comment).filter(models.Comment.post_id == post.id).count()
+    query = feed_query(current_user.id).where(models.Post.user_id == user.id)
+    rows = await db.execute(keyset(query, models.Post.create_date, models.Post.id, page))
+    posts, next_cursor = paginate(hydrate_feed(rows), page)
 
-    return {"posts": posts}
+    return PostPage.model_validate({"posts": posts, "next_cursor": next_cursor}, from_attributes=True)
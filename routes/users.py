@@ -1,28 +1,34 @@
-import os, random
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, status, Query
-from sqlalchemy.orm import Session
+from datetime import datetime
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, File, UploadFile, status, Query
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import models
-from passlib.context import CryptContext
-from schemas.user_schemas import UserCreate, UserUpdate, PasswordUpdate
-from core.dependencies import get_db
+from schemas.common_schemas import Message
+from schemas.user_schemas import (UserCreate, UserUpdate, PasswordUpdate, UserPublic, UserProfile, UserCreated,
+                                  ProfileUpdated, ProfilePictureUpdated, UserSearchResult)
+from core.dependencies import get_db, get_read_db
+from core.rate_limit import signup_limit, upload_limit
+from core.response_cache import cached, response_cache
 from routes.auth import get_current_user
-from typing import Annotated
+from services.images import process_image, sanitize, variant_urls
+from services.passwords import password_hasher
+from services.search import user_search
+from services.suggestions import suggestion_pool
+from services.timeline import timeline
+from services.storage import storage
+from services.user_cache import user_cache
+from typing import Annotated, List
 
 router = APIRouter(prefix="/users", tags=["users"])
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-UPLOAD_DIR = "uploads/profile_pictures"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-
-@router.post("/create_user", status_code=status.HTTP_201_CREATED)
-async def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user_by_email = db.query(models.User).filter(models.User.email == user.email).first()
+@router.post("/create_user", response_model=UserCreated, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(signup_limit)])
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user_by_email = await db.scalar(select(models.User).where(models.User.email == user.email))
     if db_user_by_email:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    db_user_by_username = db.query(models.User).filter(models.User.username == user.username).first()
+    db_user_by_username = await db.scalar(select(models.User).where(models.User.username == user.username))
     if db_user_by_username:
         raise HTTPException(status_code=400, detail="Username already registered")
 
@@ -30,35 +36,38 @@ async def create_user(user: UserCreate, db: Session = Depends(get_db)):
         full_name=user.full_name,
         username=user.username,
         email=user.email,
-        password=bcrypt_context.hash(user.password)
+        password=await password_hasher.hash(user.password)
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    user_search.add(new_user)
+    suggestion_pool.add(new_user)
+    await response_cache.invalidate("users")
 
     return {"message": "User created successfully", "user": new_user}
 
 
-@router.get("/me", status_code=status.HTTP_200_OK)
+@router.get("/me", response_model=UserProfile, status_code=status.HTTP_200_OK)
 async def root(current_user: Annotated[dict, Depends(get_current_user)]):
     return current_user
 
 
-@router.put("/me", status_code=status.HTTP_200_OK)
+@router.put("/me", response_model=ProfileUpdated, status_code=status.HTTP_200_OK)
 async def update_profile(updated_data: UserUpdate, current_user: Annotated[dict, Depends(get_current_user)],
-                         db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == current_user.id).first()
+                         db: AsyncSession = Depends(get_db)):
+    user = await db.get(models.User, current_user.id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     if updated_data.email and updated_data.email != user.email:
-        existing_email = db.query(models.User).filter(models.User.email == updated_data.email).first()
+        existing_email = await db.scalar(select(models.User).where(models.User.email == updated_data.email))
         if existing_email:
             raise HTTPException(status_code=400, detail="Email already in use")
 
     if updated_data.username and updated_data.username != user.username:
-        existing_username = db.query(models.User).filter(models.User.username == updated_data.username).first()
+        existing_username = await db.scalar(select(models.User).where(models.User.username == updated_data.username))
         if existing_username:
             raise HTTPException(status_code=400, detail="Username already taken")
 
@@ -67,63 +76,92 @@ async def update_profile(updated_data: UserUpdate, current_user: Annotated[dict,
     user.email = updated_data.email or user.email
     user.description = updated_data.description or user.description
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    await user_cache.invalidate(user.id)
+    user_search.add(user)
+    await response_cache.invalidate("users", f"user:{user.id}:posts")
 
     return {"message": "Profile updated successfully", "user": user}
 
 
-@router.put("/me/change-password", status_code=status.HTTP_200_OK)
+@router.put("/me/change-password", response_model=Message, status_code=status.HTTP_200_OK)
 async def update_password(password_data: PasswordUpdate, current_user: Annotated[dict, Depends(get_current_user)],
-                          db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == current_user.id).first()
+                          db: AsyncSession = Depends(get_db)):
+    user = await db.get(models.User, current_user.id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if not bcrypt_context.verify(password_data.current_password, user.password):
+    verified, _ = await password_hasher.verify(password_data.current_password, user.password)
+    if not verified:
         raise HTTPException(status_code=400, detail="Incorrect current password")
 
-    hashed_password = bcrypt_context.hash(password_data.new_password)
+    hashed_password = await password_hasher.hash(password_data.new_password)
     user.password = hashed_password
 
-    db.commit()
+    await db.commit()
+    await user_cache.invalidate(user.id)
 
     return {"message": "Password updated successfully"}
 
 
-@router.post("/upload-profile-picture", status_code=status.HTTP_200_OK)
-async def upload_profile_picture(file: UploadFile = File(...), current_user: dict = Depends(get_current_user),
-                                 db: Session = Depends(get_db)):
-    user_id = current_user.id
-    filename = f"user_{user_id}_{file.filename}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
-
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+@router.delete("/me", response_model=Message, status_code=status.HTTP_200_OK)
+async def delete_account(current_user: Annotated[dict, Depends(get_current_user)], db: AsyncSession = Depends(get_db)):
+    user = await db.get(models.User, current_user.id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    user.profile_picture = file_path.replace("\\", "/")
-    db.commit()
-    db.refresh(user)
+    # The account and its posts disappear from every read right away; services/purge.py deletes the rows,
+    # together with the user's likes and comments, in bounded batches
+    now = datetime.now()
+    user.deleted_at = now
+    posts = (await db.execute(update(models.Post).where(
+        models.Post.user_id == user.id, models.Post.deleted_at.is_(None)).values(
+        deleted_at=now, trending_score=0).returning(models.Post.create_date, models.Post.id))).all()
+    commented = (await db.scalars(select(models.Comment.post_id).where(
+        models.Comment.user_id == user.id).distinct())).all()
+    await db.commit()
+    await timeline.retract_many(posts)
+    await user_cache.invalidate(user.id)
+    user_search.remove(user.id)
+    suggestion_pool.remove(user.id)
+    # Threads under the account's posts and its comments on other people's posts are cached per post
+    await response_cache.invalidate("users", "trending", f"user:{user.id}:posts",
+                                    *{f"post:{post_id}:comments" for post_id in {*commented, *(p.id for p in posts)}})
+
+    return {"message": "Account eliminated successfully"}
+
+
+@router.post("/upload-profile-picture", response_model=ProfilePictureUpdated, status_code=status.HTTP_200_OK,
+             dependencies=[Depends(upload_limit.by_user(get_current_user))])
+async def upload_profile_picture(background_tasks: BackgroundTasks, file: UploadFile = File(...),
+                                 current_user: dict = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    user = await db.get(models.User, current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
 
-    return {"message": "Profile picture updated successfully", "profile_picture": file_path}
+    file_path = (await storage.save(file, "profile_pictures", prepare=sanitize)).path
+    background_tasks.add_task(process_image, file_path)
+    user.profile_picture = file_path
+    await db.commit()
+    await db.refresh(user)
+    await user_cache.invalidate(user.id)
+    await response_cache.invalidate("users", f"user:{user.id}:posts")
 
+    return {"message": "Profile picture updated successfully", "profile_picture": file_path,
+            "variants": variant_urls(file_path)}
 
-@router.get("/search", status_code=status.HTTP_200_OK)
-async def search_user(query: str = Query(..., min_length=1), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.username.ilike(f"%{query}%")).all()
 
-    return {"user": user}
+@router.get("/search", response_model=UserSearchResult, status_code=status.HTTP_200_OK)
+@cached(ttl=30, tags=lambda **_: ["users"])
+async def search_user(query: str = Query(..., min_length=1, max_length=50), limit: int = Query(10, ge=1, le=50),
+                      db: AsyncSession = Depends(get_read_db)):
+    # Ranked and capped rather than paged: as-you-type clients only ever show the best few matches
+    user = await user_search.search(db, query, limit)
 
+    return UserSearchResult.model_validate({"user": user}, from_attributes=True)
 
-@router.get("/suggested", status_code=status.HTTP_200_OK)
-async def get_suggested_users(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    users = db.query(models.User).all()
-    random_users = random.sample(users, min(len(users), 5))
 
-    return [
-        {"id": user.id, "username": user.username, "full_name": user.full_name, "profile_picture": user.profile_picture}
-        for user in random_users if user.id != current_user.id]
+@router.get("/suggested", response_model=List[UserPublic], status_code=status.HTTP_200_OK)
+async def get_suggested_users(db: AsyncSession = Depends(get_read_db), current_user: dict = Depends(get_current_user)):
+    return await suggestion_pool.sample(db, current_user.id, 5)
@@ -0,0 +1,59 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from starlette import status
+from typing import Optional
+from core.database import SessionLocal
+from core.metrics import WS_CONNECTIONS
+from routes.auth import user_from_token
+from services.events import event_bus
+
+router = APIRouter(tags=["live"])
+
+
+@router.websocket("/ws")
+async def live_updates(websocket: WebSocket, token: Optional[str] = Query(None)):
+    # Browsers can't set headers on a WebSocket handshake, so the JWT may come as ?token=
+    authorization = websocket.headers.get("authorization", "")
+    token = token or authorization.removeprefix("Bearer ").strip()
+    try:
+        # The session only lives for the handshake, an open socket must not pin a pooled connection
+        async with SessionLocal() as db:
+            await user_from_token(token, db)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscription = event_bus.subscribe()
+    WS_CONNECTIONS.inc()
+
+    async def read_commands():
+        # {"watch": [post ids]} / {"unwatch": [post ids]} as the client scrolls
+        while True:
+            command = await websocket.receive_json()
+            if not isinstance(command, dict):
+                continue
+            event_bus.watch(subscription, [int(i) for i in command.get("watch", [])])
+            event_bus.unwatch(subscription, [int(i) for i in command.get("unwatch", [])])
+
+    async def send_frames():
+        while True:
+            frame = await subscription.frames.get()
+            if subscription.overflowed:
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+            await websocket.send_json(frame)
+
+    tasks = [asyncio.create_task(read_commands()), asyncio.create_task(send_frames())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            # A disconnect or a malformed command ends the connection; anything else is a bug worth a traceback
+            error = task.exception()
+            if error and not isinstance(error, (WebSocketDisconnect, ValueError, TypeError)):
+                raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+        event_bus.unsubscribe(subscription)
+        WS_CONNECTIONS.dec()
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 
 
 # Schema to create a comment
@@ -25,3 +25,23 @@ class Comment(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class CommentPage(BaseModel):
+    comments: List[Comment]
+    next_cursor: Optional[str] = None
+
+
+class PostComments(BaseModel):
+    post_id: int
+    comments: List[Comment]
+    next_cursor: Optional[str] = None
+
+
+class CommentBatch(BaseModel):
+    posts: List[PostComments]
+
+
+class CommentCreated(BaseModel):
+    message: str
+    comment: Comment
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import Dict, Optional
+
+
+class Message(BaseModel):
+    message: str
+
+
+class DatabaseHealth(BaseModel):
+    status: str
+    pool: Dict[str, int]
+    replica_lag: Dict[str, Optional[float]] = {}
@@ -1,6 +1,31 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List
 
 
 # Schema to create a comment
 class LikeCreate(BaseModel):
-    post_id: int
\ No newline at end of file
+    post_id: int
+
+
+class Like(BaseModel):
+    id: int
+    user_id: int
+    post_id: int
+
+    class Config:
+        from_attributes = True
+
+
+class LikeCreated(BaseModel):
+    message: str
+    comment: Like
+
+
+class LikeBatch(BaseModel):
+    like: List[int] = Field([], max_length=100)
+    unlike: List[int] = Field([], max_length=100)
+
+
+class LikeBatchResult(BaseModel):
+    liked: List[int]
+    unliked: List[int]
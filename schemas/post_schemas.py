@@ -1,8 +1,49 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional, List, Dict
+from schemas.like_schema import Like
+from schemas.user_schemas import UserPublic
 
 
 # Schema to create a post
 class PostCreate(BaseModel):
     title: str
     body: str
+
+
+class Post(BaseModel):
+    id: int
+    title: str
+    body: str
+    image: Optional[str] = None
+    create_date: datetime
+    user_id: int
+    # Rendition URLs by size and format, e.g. imageVariants["thumb"]["webp"]
+    imageVariants: Optional[Dict[str, Dict[str, str]]] = None
+
+    class Config:
+        from_attributes = True
+
+
+# Post as shown in the feeds, with its author, counters and the caller's own like
+class FeedPost(Post):
+    author: UserPublic
+    likesCount: int
+    commentsCount: int
+    userLike: Optional[Like] = None
+
+
+class PostPage(BaseModel):
+    posts: List[FeedPost]
+    next_cursor: Optional[str] = None
+
+
+# Trending is a bounded ranking that reshuffles as scores change, so it pages by offset rather than by cursor
+class TrendingPage(BaseModel):
+    posts: List[FeedPost]
+    next_offset: Optional[int] = None
+
+
+class PostCreated(BaseModel):
+    message: str
+    post: Post
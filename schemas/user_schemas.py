@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, constr
-from typing import Optional
+from typing import Optional, List, Dict
 from datetime import datetime
 
 
@@ -26,15 +26,43 @@ class PasswordUpdate(BaseModel):
     new_password: str
 
 
-# class User(BaseModel):
-#     id: int
-#     username: str
-#     email: EmailStr
-#     date_created: datetime
-#
-#     # This class allows to covert data from SQLachemy to Pydantic
-#     class Config:
-#         from_attributes = True
+# Public view of a user, safe to show to anyone
+class UserPublic(BaseModel):
+    id: int
+    username: str
+    full_name: str
+    profile_picture: Optional[str] = None
+
+    # This class allows to covert data from SQLachemy to Pydantic
+    class Config:
+        from_attributes = True
+
+
+# The user's own profile
+class UserProfile(UserPublic):
+    email: EmailStr
+    description: Optional[str] = None
+    create_date: Optional[datetime] = None
+
+
+class UserCreated(BaseModel):
+    message: str
+    user: UserProfile
+
+
+class ProfileUpdated(BaseModel):
+    message: str
+    user: UserProfile
+
+
+class ProfilePictureUpdated(BaseModel):
+    message: str
+    profile_picture: str
+    variants: Optional[Dict[str, Dict[str, str]]] = None
+
+
+class UserSearchResult(BaseModel):
+    user: List[UserPublic]
 
 
 class Token(BaseModel):
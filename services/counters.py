@@ -0,0 +1,57 @@
+import asyncio
+from sqlalchemy import select, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import models
+from services.trending import SCORE_COLUMNS, rescore
+
+
+async def bump(db: AsyncSession, post_id: int, column, delta: int):
+    # Relative UPDATE so concurrent writers never lose increments; committed with the caller's transaction
+    # together with the post's new trending score. Deleted posts are left alone, their counters and score no longer
+    # matter. Returns the post's author, or None when it does not exist or was deleted.
+    row = (await db.execute(update(models.Post).where(
+        models.Post.id == post_id, models.Post.deleted_at.is_(None)).values(
+        {column: column + delta}).returning(models.Post.user_id, *SCORE_COLUMNS))).first()
+    if row is None:
+        return None
+    await rescore(db, [row])
+    return row.user_id
+
+
+async def bump_many(db: AsyncSession, post_ids, column, delta: int):
+    # Same as bump for a set of distinct posts in one statement; returns the authors of the posts touched
+    if not post_ids:
+        return []
+    rows = (await db.execute(update(models.Post).where(
+        models.Post.id.in_(post_ids), models.Post.deleted_at.is_(None)).values(
+        {column: column + delta}).returning(models.Post.user_id, *SCORE_COLUMNS))).all()
+    await rescore(db, rows)
+    return [row.user_id for row in rows]
+
+
+async def reconcile_counters(db: AsyncSession):
+    likes_count = select(func.count(models.Like.id)).where(
+        models.Like.post_id == models.Post.id).correlate(models.Post).scalar_subquery()
+    comments_count = select(func.count(models.Comment.id)).where(
+        models.Comment.post_id == models.Post.id).correlate(models.Post).scalar_subquery()
+
+    likes = (await db.execute(update(models.Post).where(models.Post.like_count != likes_count).values(
+        like_count=likes_count))).rowcount
+    comments = (await db.execute(update(models.Post).where(models.Post.comment_count != comments_count).values(
+        comment_count=comments_count))).rowcount
+    await db.commit()
+
+    return {"like_count": likes, "comment_count": comments}
+
+
+async def main():
+    from core.database import SessionLocal, engine
+
+    async with SessionLocal() as session:
+        fixed = await reconcile_counters(session)
+    await engine.dispose()
+    print(f"Reconciled {fixed['like_count']} like counters and {fixed['comment_count']} comment counters")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
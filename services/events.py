@@ -0,0 +1,161 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set
+from core.cache import is_redis_url, redis_client
+from core.config import settings
+
+logger = logging.getLogger('uvicorn.error')
+
+CHANNEL = "events:posts"
+MAX_COMMENTS_PER_FLUSH = 20
+
+
+class MemoryBroker:
+    # Single worker: published events come straight back to this process
+    def __init__(self):
+        self._deliver = None
+
+    async def start(self, deliver):
+        self._deliver = deliver
+
+    async def publish(self, message: str):
+        if self._deliver is not None:
+            self._deliver(message)
+
+    async def stop(self):
+        self._deliver = None
+
+
+class RedisBroker:
+    # Every worker publishes to and listens on one channel, so subscribers see changes made anywhere
+    def __init__(self, client):
+        self.client = client
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, deliver):
+        self._listener = asyncio.create_task(self._listen(deliver))
+
+    async def _listen(self, deliver):
+        while True:
+            try:
+                async with self.client.pubsub() as pubsub:
+                    await pubsub.subscribe(CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            deliver(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Lost the event channel, resubscribing")
+                await asyncio.sleep(1)
+
+    async def publish(self, message: str):
+        await self.client.publish(CHANNEL, message)
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+
+def make_broker(url: str):
+    if url.startswith("memory://"):
+        return MemoryBroker()
+    if is_redis_url(url):
+        return RedisBroker(redis_client(url))
+    raise ValueError(f"Unsupported EVENTS_BROKER_URL: {url}")
+
+
+class Subscription:
+    def __init__(self):
+        self.post_ids: Set[int] = set()
+        # A client that can't keep up is disconnected rather than buffered without bound
+        self.frames: asyncio.Queue = asyncio.Queue(maxsize=8)
+        self.overflowed = False
+
+
+class EventBus:
+    # Changes to a post are merged into one pending entry per post, and every flush sends each subscriber a single
+    # frame with the entries of the posts it watches: a post liked a thousand times in a second costs each
+    # subscriber two frames, not a thousand
+    def __init__(self, broker, flush_interval: float):
+        self.broker = broker
+        self.flush_interval = flush_interval
+        self._watchers: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._pending: Dict[int, dict] = {}
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self.broker.start(self._receive)
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.broker.stop()
+
+    def subscribe(self) -> Subscription:
+        return Subscription()
+
+    def watch(self, subscription: Subscription, post_ids: Iterable[int]):
+        for post_id in post_ids:
+            if len(subscription.post_ids) >= settings.WS_MAX_SUBSCRIPTIONS:
+                break
+            subscription.post_ids.add(post_id)
+            self._watchers[post_id].add(subscription)
+
+    def unwatch(self, subscription: Subscription, post_ids: Iterable[int]):
+        for post_id in post_ids:
+            subscription.post_ids.discard(post_id)
+            watchers = self._watchers.get(post_id)
+            if watchers is not None:
+                watchers.discard(subscription)
+                if not watchers:
+                    del self._watchers[post_id]
+
+    def unsubscribe(self, subscription: Subscription):
+        self.unwatch(subscription, list(subscription.post_ids))
+
+    async def publish(self, post_id: int, **change):
+        await self.broker.publish(json.dumps({"post_id": post_id, **change}, default=str))
+
+    def _receive(self, message):
+        event = json.loads(message)
+        post_id = event["post_id"]
+        if post_id not in self._watchers:
+            return
+        pending = self._pending.get(post_id)
+        if pending is None:
+            pending = self._pending[post_id] = {"post_id": post_id, "likesDelta": 0, "commentsDelta": 0,
+                                                "commentsAdded": [], "commentsDeleted": []}
+        if "likes" in event:
+            pending["likesDelta"] += event["likes"]
+        if "comment" in event:
+            pending["commentsDelta"] += 1
+            pending["commentsAdded"] = (pending["commentsAdded"] + [event["comment"]])[-MAX_COMMENTS_PER_FLUSH:]
+        if "deleted_comment" in event:
+            pending["commentsDelta"] -= 1
+            pending["commentsDeleted"].append(event["deleted_comment"])
+
+    def flush(self):
+        pending, self._pending = self._pending, {}
+        frames: Dict[Subscription, list] = defaultdict(list)
+        for post_id, change in pending.items():
+            for subscription in self._watchers.get(post_id, ()):
+                frames[subscription].append(change)
+        for subscription, changes in frames.items():
+            try:
+                subscription.frames.put_nowait({"type": "posts", "changes": changes})
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+
+event_bus = EventBus(make_broker(settings.EVENTS_BROKER_URL), settings.EVENTS_FLUSH_SECONDS)
@@ -0,0 +1,26 @@
+from sqlalchemy import select, and_
+from sqlalchemy.orm import joinedload, aliased
+from models import models
+from services.images import variant_urls
+
+
+def feed_query(current_user_id: int):
+    # The caller's own like is resolved in the same statement as the posts and their stored counters,
+    # so a feed page costs one round trip no matter how many posts it has. Soft-deleted posts never show up;
+    # closing an account soft-deletes its posts too.
+    user_like = aliased(models.Like)
+
+    return select(models.Post, user_like).options(joinedload(models.Post.author)).outerjoin(
+        user_like, and_(user_like.post_id == models.Post.id, user_like.user_id == current_user_id)).where(
+        models.Post.deleted_at.is_(None))
+
+
+def hydrate_feed(rows):
+    posts = []
+    for post, user_like in rows:
+        post.likesCount = post.like_count
+        post.userLike = user_like
+        post.commentsCount = post.comment_count
+        post.imageVariants = variant_urls(post.image)
+        posts.append(post)
+    return posts
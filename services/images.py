@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from PIL import Image, ImageOps, features
+from core.config import settings
+from services.storage import storage
+
+logger = logging.getLogger('uvicorn.error')
+
+# Longest side in pixels of every rendition; "full" is the re-encoded original without EXIF
+VARIANT_SIZES = {"thumb": 150, "small": 480, "medium": 1080, "full": 2048}
+VARIANT_FORMATS = ["webp", "avif"] if features.check("avif") else ["webp"]
+
+# Still image formats whose uploads are re-encoded before they are stored, to drop EXIF such as the GPS position
+STRIPPED_FORMATS = {"JPEG", "PNG", "WEBP", "TIFF"}
+METADATA_KEYS = {"exif", "xmp", "XML:com.adobe.xmp"}
+# Extension uploads are stored under by decoded format, whatever the client named the file
+IMAGE_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp", "TIFF": ".tif", "BMP": ".bmp",
+                    "AVIF": ".avif"}
+# Only files Pillow can open get renditions; this also covers the extensions of uploads stored before sanitize()
+DECODABLE_EXTENSIONS = {extension for extension, fmt in Image.registered_extensions().items() if fmt in Image.OPEN}
+
+CONTENT_ADDRESSED = re.compile(r"/[0-9a-f]{64}(\.\w+)$")
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def variant_path(path: str, size: str, fmt: str) -> str:
+    return f"{os.path.splitext(path)[0]}_{size}.{fmt}"
+
+
+def variant_urls(path: Optional[str]) -> Optional[dict]:
+    # Renditions are derived from the content hash, so their URLs are known before they are rendered
+    match = CONTENT_ADDRESSED.search(path) if path else None
+    if match is None or match.group(1).lower() not in DECODABLE_EXTENSIONS:
+        return None
+    return {size: {fmt: variant_path(path, size, fmt) for fmt in VARIANT_FORMATS} for size in VARIANT_SIZES}
+
+
+def sanitize_image(path: str) -> str:
+    # Runs on the spooled upload before it is hashed and named: strips the metadata in place and returns the
+    # extension of the decoded format, or "" for anything Pillow can't open, which then never gets renditions
+    try:
+        with Image.open(path) as original:
+            extension = IMAGE_EXTENSIONS.get(original.format, "")
+            if original.format in STRIPPED_FORMATS and not getattr(original, "is_animated", False) and (
+                    original.getexif() or METADATA_KEYS & original.info.keys()):
+                image = ImageOps.exif_transpose(original)
+                tmp_path = f"{path}.clean"
+                image.save(tmp_path, format=original.format, quality=95,
+                           icc_profile=original.info.get("icc_profile"))
+                os.replace(tmp_path, path)
+            return extension
+    except (OSError, SyntaxError, ValueError):
+        return ""
+
+
+def render_variants(source: str, targets: dict):
+    with Image.open(source) as original:
+        # Bake the EXIF orientation into the pixels, the renditions are saved without any metadata
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        for (size, fmt), target in targets.items():
+            if os.path.exists(target):
+                continue
+            rendition = image.copy()
+            rendition.thumbnail((VARIANT_SIZES[size], VARIANT_SIZES[size]))
+            tmp_target = f"{target}.tmp"
+            rendition.save(tmp_target, format=fmt.upper(), quality=80)
+            os.replace(tmp_target, target)
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS)
+    return _executor
+
+
+async def sanitize(path: str) -> str:
+    # Passed to storage.save as its prepare step, awaited so the upload is only ever stored without metadata
+    return await asyncio.get_running_loop().run_in_executor(_pool(), sanitize_image, path)
+
+
+async def process_image(path: str):
+    variants = variant_urls(path)
+    if variants is None:
+        return
+    targets = {(size, fmt): storage.local_path(url) for size, formats in variants.items()
+               for fmt, url in formats.items()}
+    try:
+        await asyncio.get_running_loop().run_in_executor(_pool(), render_variants, storage.local_path(path),
+                                                         targets)
+    except Exception:
+        logger.exception("Could not render variants for %s", path)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
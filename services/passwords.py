@@ -0,0 +1,63 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from starlette import status
+from core.config import settings
+
+bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# Module level so they can be pickled into a process pool
+def _hash(password: str) -> str:
+    return bcrypt_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return bcrypt_context.verify_and_update(password, hashed)
+
+
+class PasswordHasher:
+    def __init__(self, executor_type: str, workers: int, max_pending: int):
+        self.executor_type = executor_type
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        # Work queued behind busy workers only adds latency, so shed it instead of letting logins pile up
+        if self._pending >= self.max_pending:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                                detail="Too many password operations in progress, try again later",
+                                headers={"Retry-After": "1"})
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password)
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        # The second value is a replacement hash when the stored one uses outdated parameters
+        return await self._submit(_verify_and_update, password, hashed)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_EXECUTOR, settings.PASSWORD_HASH_WORKERS,
+                                 settings.PASSWORD_HASH_MAX_PENDING)
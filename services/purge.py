@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from sqlalchemy import delete, exists, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from core.response_cache import response_cache
+from models import models
+from services.counters import bump_many
+from services.timeline import timeline
+
+logger = logging.getLogger('uvicorn.error')
+
+
+async def _uncount(db: AsyncSession, post_ids, column) -> set:
+    # Posts that lost n rows are decremented by n, one UPDATE per distinct n
+    by_count = defaultdict(list)
+    for post_id, count in Counter(post_ids).items():
+        by_count[count].append(post_id)
+    authors = set()
+    for count, ids in by_count.items():
+        authors.update(await bump_many(db, ids, column, -count))
+    return authors
+
+
+async def purge_batch(db: AsyncSession, batch_size: int) -> int:
+    # Every statement touches at most batch_size rows, so a post with 50k likes is removed over several short
+    # transactions instead of one long one. Children go first; a post or account is deleted once it has none left,
+    # and ON DELETE CASCADE only has to catch rows written in between.
+    deleted_posts = select(models.Post.id).where(models.Post.deleted_at.is_not(None))
+    deleted_users = select(models.User.id).where(models.User.deleted_at.is_not(None))
+
+    like_ids = select(models.Like.id).where(or_(models.Like.post_id.in_(deleted_posts),
+                                                models.Like.user_id.in_(deleted_users))).limit(batch_size)
+    liked_posts = (await db.scalars(delete(models.Like).where(models.Like.id.in_(like_ids)).returning(
+        models.Like.post_id).execution_options(synchronize_session=False))).all()
+
+    comment_ids = select(models.Comment.id).where(or_(models.Comment.post_id.in_(deleted_posts),
+                                                      models.Comment.user_id.in_(deleted_users))).limit(batch_size)
+    commented_posts = (await db.scalars(delete(models.Comment).where(models.Comment.id.in_(comment_ids)).returning(
+        models.Comment.post_id).execution_options(synchronize_session=False))).all()
+
+    # Likes and comments a closed account left on other people's posts still count there
+    authors = await _uncount(db, liked_posts, models.Post.like_count)
+    authors |= await _uncount(db, commented_posts, models.Post.comment_count)
+
+    post_ids = select(models.Post.id).where(
+        models.Post.deleted_at.is_not(None),
+        ~exists().where(models.Like.post_id == models.Post.id),
+        ~exists().where(models.Comment.post_id == models.Post.id)).limit(batch_size)
+    posts = (await db.execute(delete(models.Post).where(models.Post.id.in_(post_ids)).returning(
+        models.Post.create_date, models.Post.id).execution_options(synchronize_session=False))).all()
+
+    user_ids = select(models.User.id).where(
+        models.User.deleted_at.is_not(None),
+        ~exists().where(models.Post.user_id == models.User.id),
+        ~exists().where(models.Like.user_id == models.User.id),
+        ~exists().where(models.Comment.user_id == models.User.id)).limit(batch_size)
+    users = (await db.execute(delete(models.User).where(models.User.id.in_(user_ids)).execution_options(
+        synchronize_session=False))).rowcount
+
+    await db.commit()
+    # Workers that missed the retract when the post was deleted may still hold it in a timeline
+    await timeline.retract_many(posts)
+    await response_cache.invalidate(*{f"user:{author_id}:posts" for author_id in authors},
+                                    *{f"post:{post_id}:comments" for post_id in set(commented_posts)},
+                                    *(["trending"] if authors or posts else []))
+    return len(liked_posts) + len(commented_posts) + len(posts) + users
+
+
+async def purge(db: AsyncSession, batch_size: int) -> int:
+    total = 0
+    while purged := await purge_batch(db, batch_size):
+        total += purged
+    return total
+
+
+async def run(interval: int, batch_size: int):
+    from core.database import SessionLocal
+
+    # Batches run back to back while there is a backlog and the worker sleeps once it is drained
+    while True:
+        try:
+            async with SessionLocal() as db:
+                purged = await purge(db, batch_size)
+            if purged:
+                logger.info("Purged %d soft-deleted rows", purged)
+        except Exception:
+            logger.exception("Purging soft-deleted rows failed")
+        await asyncio.sleep(interval)
+
+
+async def main():
+    from core.database import SessionLocal, engine
+
+    async with SessionLocal() as session:
+        purged = await purge(session, settings.PURGE_BATCH_SIZE)
+    await engine.dispose()
+    print(f"Purged {purged} soft-deleted rows")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+import bisect
+from collections import Counter, defaultdict
+from typing import List
+from sqlalchemy import select, func, or_, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.database import engine
+from models import models
+
+# Same threshold pg_trgm uses for its % operator
+SIMILARITY_THRESHOLD = 0.3
+# Shorter queries have no trigram to look up, so they only match as a prefix
+MIN_TRIGRAM_QUERY = 3
+
+
+def trigrams(text: str) -> set:
+    # pg_trgm style: every word padded with two leading and one trailing space
+    grams = set()
+    for word in text.lower().split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(left: set, right: set) -> float:
+    return len(left & right) / len(left | right) if left and right else 0.0
+
+
+def escape_like(query: str) -> str:
+    return query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class PostgresUserSearch:
+    # ILIKE '%q%' and % both go through the GIN trigram indexes on username and full_name
+    async def search(self, db: AsyncSession, query: str, limit: int) -> List[models.User]:
+        query = query.strip()
+        pattern = escape_like(query)
+        if len(query) < MIN_TRIGRAM_QUERY:
+            # A '%q%' pattern with one or two characters can't use the GIN indexes and scans every user;
+            # a left-anchored LIKE walks ix_users_username_lower_prefix instead
+            username = func.lower(models.User.username)
+            statement = select(models.User).where(models.User.deleted_at.is_(None),
+                                                  username.like(f"{pattern.lower()}%")).order_by(
+                username, models.User.id).limit(limit)
+            return (await db.scalars(statement)).all()
+        score = func.greatest(func.similarity(models.User.username, query),
+                              func.similarity(models.User.full_name, query))
+        statement = select(models.User).where(models.User.deleted_at.is_(None), or_(
+            models.User.username.ilike(f"%{pattern}%"), models.User.full_name.ilike(f"%{pattern}%"),
+            models.User.username.op("%")(query), models.User.full_name.op("%")(query),
+        )).order_by(case((models.User.username.ilike(f"{pattern}%"), 0), else_=1), score.desc(),
+                    models.User.id).limit(limit)
+        return (await db.scalars(statement)).all()
+
+    def add(self, user: models.User):
+        pass
+
+    def remove(self, user_id: int):
+        pass
+
+
+class MemoryUserSearch:
+    # Trigram posting lists plus a sorted prefix list, loaded once from the users table. Used on
+    # databases without pg_trgm (SQLite in development and tests).
+    def __init__(self):
+        self._loaded = False
+        self._users = {}
+        self._trigrams = defaultdict(set)
+        self._prefixes = []
+
+    async def _load(self, db: AsyncSession):
+        rows = await db.execute(select(models.User.id, models.User.username, models.User.full_name).where(
+            models.User.deleted_at.is_(None)))
+        for user_id, username, full_name in rows:
+            self._index(user_id, username, full_name)
+        self._loaded = True
+
+    def _index(self, user_id: int, username: str, full_name: str):
+        if user_id in self._users:
+            self._unindex(user_id)
+        grams = trigrams(username), trigrams(full_name)
+        self._users[user_id] = (username.lower(), full_name.lower(), grams)
+        for gram in grams[0] | grams[1]:
+            self._trigrams[gram].add(user_id)
+        for word in {username.lower(), *full_name.lower().split()}:
+            bisect.insort(self._prefixes, (word, user_id))
+
+    def _unindex(self, user_id: int):
+        username, full_name, grams = self._users.pop(user_id)
+        for gram in grams[0] | grams[1]:
+            self._trigrams[gram].discard(user_id)
+        for word in {username, *full_name.split()}:
+            index = bisect.bisect_left(self._prefixes, (word, user_id))
+            if index < len(self._prefixes) and self._prefixes[index] == (word, user_id):
+                del self._prefixes[index]
+
+    def add(self, user: models.User):
+        if self._loaded:
+            self._index(user.id, user.username, user.full_name)
+
+    def remove(self, user_id: int):
+        if user_id in self._users:
+            self._unindex(user_id)
+
+    def _candidates(self, query: str, query_grams: set) -> set:
+        candidates = set()
+        start = bisect.bisect_left(self._prefixes, (query,))
+        for word, user_id in self._prefixes[start:]:
+            if not word.startswith(query):
+                break
+            candidates.add(user_id)
+        if len(query) >= MIN_TRIGRAM_QUERY:
+            hits = Counter(user_id for gram in query_grams for user_id in self._trigrams.get(gram, ()))
+            candidates.update(user_id for user_id, shared in hits.items() if shared >= len(query_grams) * 0.3)
+            # Substrings: a name containing the query has every unpadded trigram of its words, wherever in the
+            # name they start; _rank confirms the actual substring match
+            inner = {word[i:i + 3] for word in query.split() for i in range(len(word) - 2)}
+            if inner:
+                candidates.update(set.intersection(*(self._trigrams.get(gram, set()) for gram in inner)))
+        return candidates
+
+    def _rank(self, user_id: int, query: str, query_grams: set):
+        username, full_name, grams = self._users[user_id]
+        score = max(similarity(query_grams, grams[0]), similarity(query_grams, grams[1]))
+        if not (query in username or query in full_name or score >= SIMILARITY_THRESHOLD):
+            return None
+        return not username.startswith(query), -score, user_id
+
+    async def search(self, db: AsyncSession, query: str, limit: int) -> List[models.User]:
+        if not self._loaded:
+            await self._load(db)
+        query = query.lower().strip()
+        query_grams = trigrams(query)
+        ranked = sorted(rank for rank in (self._rank(user_id, query, query_grams)
+                                          for user_id in self._candidates(query, query_grams)) if rank)
+        user_ids = [user_id for _, _, user_id in ranked[:limit]]
+        users = {user.id: user for user in await db.scalars(select(models.User).where(models.User.id.in_(user_ids)))}
+        return [users[user_id] for user_id in user_ids if user_id in users]
+
+
+user_search = PostgresUserSearch() if engine.dialect.name == "postgresql" else MemoryUserSearch()
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, NamedTuple, Optional
+from fastapi import HTTPException, UploadFile
+from starlette import status
+from starlette.concurrency import run_in_threadpool
+from core.config import settings
+
+CHUNK_SIZE = 1024 * 1024
+
+# Receives the spooled upload before it is named; may rewrite it and returns the extension to store it under
+Prepare = Callable[[str], Awaitable[str]]
+
+
+class StoredFile(NamedTuple):
+    path: str
+    digest: str
+    size: int
+
+
+class StorageBackend(ABC):
+    # Backends store uploads under a path derived from their SHA-256, so identical uploads share one object
+    @abstractmethod
+    async def save(self, upload: UploadFile, namespace: str, prepare: Optional[Prepare] = None) -> StoredFile:
+        ...
+
+
+def file_digest(path: str):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest(), os.path.getsize(path)
+
+
+def content_path(namespace: str, digest: str, extension: str) -> str:
+    extension = extension.lower()
+    if not re.fullmatch(r"\.[a-z0-9]{1,10}", extension):
+        extension = ""
+    return f"{namespace}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+class LocalStorage(StorageBackend):
+    # Files live under root on disk and are referenced as "uploads/<path>", the URL they are served from
+    def __init__(self, root: str, max_bytes: int, url_prefix: str = "uploads"):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.url_prefix = url_prefix
+
+    async def save(self, upload: UploadFile, namespace: str, prepare: Optional[Prepare] = None) -> StoredFile:
+        tmp_dir = os.path.join(self.root, ".tmp")
+        await run_in_threadpool(os.makedirs, tmp_dir, exist_ok=True)
+        fd, tmp_path = await run_in_threadpool(tempfile.mkstemp, dir=tmp_dir)
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as buffer:
+                while chunk := await upload.read(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                            detail=f"File exceeds the {self.max_bytes} bytes limit")
+                    hasher.update(chunk)
+                    await run_in_threadpool(buffer.write, chunk)
+
+            digest = hasher.hexdigest()
+            extension = os.path.splitext(upload.filename or "")[1]
+            if prepare is not None:
+                # The name has to hash the bytes that will be served, files under it are never rewritten
+                extension = await prepare(tmp_path)
+                digest, size = await run_in_threadpool(file_digest, tmp_path)
+            path = content_path(namespace, digest, extension)
+            await run_in_threadpool(self._commit, tmp_path, os.path.join(self.root, path))
+        finally:
+            if os.path.exists(tmp_path):
+                await run_in_threadpool(os.remove, tmp_path)
+
+        return StoredFile(path=f"{self.url_prefix}/{path}", digest=digest, size=size)
+
+    @staticmethod
+    def _commit(tmp_path: str, final_path: str):
+        # Same content means same path: an existing file is already the right one, otherwise the
+        # rename is atomic so concurrent uploads of the same bytes can't leave a half-written file
+        if os.path.exists(final_path):
+            return
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path)
+
+    def local_path(self, path: str) -> str:
+        return os.path.join(self.root, path.removeprefix(f"{self.url_prefix}/"))
+
+
+storage = LocalStorage(settings.UPLOAD_DIR, settings.UPLOAD_MAX_BYTES)
@@ -0,0 +1,77 @@
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from typing import List
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from models import models
+
+# How many readers keep their "already suggested" set in memory
+MAX_TRACKED_READERS = 10000
+
+
+class SuggestionPool:
+    def __init__(self, size: int, refresh_seconds: int):
+        self.size = size
+        self.refresh_seconds = refresh_seconds
+        self._pool: List[dict] = []
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+        self._seen: OrderedDict = OrderedDict()
+
+    async def _refresh(self, db: AsyncSession):
+        # Random primary keys between min(id) and max(id): two index lookups plus one IN (...) probe,
+        # whatever the size of the users table. Oversampled to make up for ids lost to deletions.
+        low, high = (await db.execute(select(func.min(models.User.id), func.max(models.User.id)))).one()
+        if low is None:
+            self._pool = []
+        else:
+            ids = random.sample(range(low, high + 1), min(2 * self.size, high - low + 1))
+            rows = await db.execute(select(models.User.id, models.User.username, models.User.full_name,
+                                           models.User.profile_picture).where(
+                models.User.id.in_(ids), models.User.deleted_at.is_(None)))
+            rows = [row._asdict() for row in rows]
+            # The database returns the probe in id order, so trimming by position would favour old accounts
+            self._pool = random.sample(rows, min(len(rows), self.size))
+        self._refreshed_at = time.monotonic()
+
+    def add(self, user: models.User):
+        # New accounts join the pool right away instead of waiting for the next refresh
+        candidate = {"id": user.id, "username": user.username, "full_name": user.full_name,
+                     "profile_picture": user.profile_picture}
+        if len(self._pool) < self.size:
+            self._pool.append(candidate)
+        else:
+            self._pool[random.randrange(self.size)] = candidate
+
+    def remove(self, user_id: int):
+        self._pool = [candidate for candidate in self._pool if candidate["id"] != user_id]
+
+    async def sample(self, db: AsyncSession, user_id: int, k: int) -> List[dict]:
+        if time.monotonic() - self._refreshed_at > self.refresh_seconds or not self._pool:
+            async with self._lock:
+                if time.monotonic() - self._refreshed_at > self.refresh_seconds or not self._pool:
+                    await self._refresh(db)
+
+        seen = self._seen.pop(user_id, set())
+        self._seen[user_id] = seen
+        if len(self._seen) > MAX_TRACKED_READERS:
+            self._seen.popitem(last=False)
+        if len(seen) >= len(self._pool) - k:
+            seen.clear()
+
+        # A bounded number of random draws, so the cost does not depend on the pool or table size
+        picks = {}
+        for _ in range(8 * k if self._pool else 0):
+            candidate = random.choice(self._pool)
+            if candidate["id"] != user_id and candidate["id"] not in seen:
+                picks[candidate["id"]] = candidate
+                if len(picks) == k:
+                    break
+        seen.update(picks)
+        return list(picks.values())
+
+
+suggestion_pool = SuggestionPool(settings.SUGGESTION_POOL_SIZE, settings.SUGGESTION_POOL_REFRESH_SECONDS)
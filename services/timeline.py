@@ -0,0 +1,242 @@
+import bisect
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.cache import is_redis_url, redis_client
+from core.config import settings
+from core.database import SessionLocal
+from core.pagination import PageParams, encode_cursor
+from models import models
+from services.feed import feed_query, hydrate_feed
+
+PROLIFIC_WINDOW = timedelta(days=1)
+MAX_READ_ROUNDS = 5
+
+
+# Entries are fixed-width "<timestamp>:<post id>" strings, so sorting them sorts by (create_date, id)
+def entry_key(create_date: datetime, post_id: int) -> str:
+    return f"{create_date.timestamp():017.6f}:{post_id:012d}"
+
+
+def entry_cursor(entry: str) -> Tuple[datetime, int]:
+    timestamp, post_id = entry.split(":")
+    return datetime.fromtimestamp(float(timestamp)), int(post_id)
+
+
+class MemoryTimelineStore:
+    # Per process: fan-out only reaches the timelines of the worker that took the write, so reads catch up
+    shared = False
+
+    def __init__(self, size: int, idle_seconds: int):
+        self.size = size
+        self.idle_seconds = idle_seconds
+        self._timelines = {}
+        self._last_read = {}
+        self._prolific = {}
+
+    async def exists(self, user_id: int) -> bool:
+        return user_id in self._timelines
+
+    async def replace(self, user_id: int, entries: List[str]):
+        self._timelines[user_id] = sorted(entries)[-self.size:]
+        self._last_read[user_id] = time.time()
+
+    async def newest(self, user_id: int) -> Optional[str]:
+        timeline = self._timelines.get(user_id)
+        return timeline[-1] if timeline else None
+
+    async def merge(self, user_id: int, entries: List[str]):
+        timeline = self._timelines.setdefault(user_id, [])
+        for entry in entries:
+            index = bisect.bisect_left(timeline, entry)
+            if index == len(timeline) or timeline[index] != entry:
+                timeline.insert(index, entry)
+        del timeline[:-self.size]
+        self._last_read[user_id] = time.time()
+
+    async def range(self, user_id: int, before: Optional[str], limit: int) -> List[str]:
+        self._last_read[user_id] = time.time()
+        timeline = self._timelines.get(user_id, [])
+        end = bisect.bisect_left(timeline, before) if before else len(timeline)
+        return timeline[max(0, end - limit):end][::-1]
+
+    async def fan_out(self, entry: str, author_id: int):
+        idle_since = time.time() - self.idle_seconds
+        for user_id in list(self._timelines):
+            if self._last_read[user_id] < idle_since:
+                del self._timelines[user_id], self._last_read[user_id]
+            elif user_id != author_id:
+                timeline = self._timelines[user_id]
+                bisect.insort(timeline, entry)
+                if len(timeline) > self.size:
+                    del timeline[0]
+
+    async def remove(self, *entries: str):
+        for timeline in self._timelines.values():
+            for entry in entries:
+                index = bisect.bisect_left(timeline, entry)
+                if index < len(timeline) and timeline[index] == entry:
+                    del timeline[index]
+
+    async def mark_prolific(self, author_id: int, seconds: float):
+        self._prolific[author_id] = time.time() + seconds
+
+    async def prolific_authors(self) -> List[int]:
+        now = time.time()
+        return [author_id for author_id, until in self._prolific.items() if until > now]
+
+
+class RedisTimelineStore:
+    # One sorted set per reader with every score at 0, so ZREVRANGEBYLEX walks entries in key order.
+    # Timelines outlive their entry in the active set, so fan-out never recreates a partial timeline.
+    shared = True
+
+    def __init__(self, client, size: int, idle_seconds: int):
+        self.client = client
+        self.size = size
+        self.idle_seconds = idle_seconds
+
+    @staticmethod
+    def _key(user_id) -> str:
+        return f"timeline:{int(user_id)}"
+
+    async def _readers(self) -> List[int]:
+        await self.client.zremrangebyscore("timeline:active", "-inf", time.time() - self.idle_seconds)
+        return [int(user_id) for user_id in await self.client.zrange("timeline:active", 0, -1)]
+
+    async def exists(self, user_id: int) -> bool:
+        return bool(await self.client.exists(self._key(user_id)))
+
+    async def replace(self, user_id: int, entries: List[str]):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(self._key(user_id))
+            if entries:
+                pipe.zadd(self._key(user_id), {entry: 0 for entry in entries})
+                pipe.zremrangebyrank(self._key(user_id), 0, -self.size - 1)
+            pipe.expire(self._key(user_id), 2 * self.idle_seconds)
+            pipe.zadd("timeline:active", {user_id: time.time()})
+            await pipe.execute()
+
+    async def range(self, user_id: int, before: Optional[str], limit: int) -> List[str]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.zrevrangebylex(self._key(user_id), f"({before}" if before else "+", "-", start=0, num=limit)
+            pipe.expire(self._key(user_id), 2 * self.idle_seconds)
+            pipe.zadd("timeline:active", {user_id: time.time()})
+            entries, _, _ = await pipe.execute()
+        return [entry.decode() if isinstance(entry, bytes) else entry for entry in entries]
+
+    async def fan_out(self, entry: str, author_id: int):
+        async with self.client.pipeline(transaction=False) as pipe:
+            for user_id in await self._readers():
+                if user_id != author_id:
+                    pipe.zadd(self._key(user_id), {entry: 0})
+                    pipe.zremrangebyrank(self._key(user_id), 0, -self.size - 1)
+            await pipe.execute()
+
+    async def remove(self, *entries: str):
+        if not entries:
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            for user_id in await self._readers():
+                pipe.zrem(self._key(user_id), *entries)
+            await pipe.execute()
+
+    async def mark_prolific(self, author_id: int, seconds: float):
+        await self.client.zadd("timeline:prolific", {author_id: time.time() + seconds})
+
+    async def prolific_authors(self) -> List[int]:
+        return [int(author_id) for author_id in await self.client.zrangebyscore("timeline:prolific", time.time(), "+inf")]
+
+
+class Timeline:
+    def __init__(self, store, size: int, prolific_posts_per_day: int):
+        self.store = store
+        self.size = size
+        self.prolific_posts_per_day = prolific_posts_per_day
+
+    async def publish(self, db: AsyncSession, post: models.Post):
+        recent_posts = await db.scalar(select(func.count(models.Post.id)).where(
+            models.Post.user_id == post.user_id, models.Post.create_date >= datetime.now() - PROLIFIC_WINDOW))
+        if recent_posts > self.prolific_posts_per_day:
+            # Fan-out-on-read: readers pick this author's posts up from the posts index instead
+            await self.store.mark_prolific(post.user_id, PROLIFIC_WINDOW.total_seconds())
+            return
+        await self.store.fan_out(entry_key(post.create_date, post.id), post.user_id)
+
+    async def retract(self, post: models.Post):
+        await self.store.remove(entry_key(post.create_date, post.id))
+
+    async def retract_many(self, rows):
+        # rows carry (create_date, id), e.g. every post of a closed account
+        await self.store.remove(*(entry_key(create_date, post_id) for create_date, post_id in rows))
+
+    async def _sync(self, user_id: int):
+        # Always from the primary: a timeline built from a lagging replica would miss its newest posts for good
+        async with SessionLocal() as primary:
+            if not await self.store.exists(user_id):
+                await self.store.replace(user_id, await self._entries(primary, models.Post.user_id != user_id, None,
+                                                                      self.size))
+            elif not self.store.shared and (newest := await self.store.newest(user_id)):
+                # Posts fanned out by other workers: whatever is newer than this timeline's head, one index range
+                await self.store.merge(user_id, await self._entries(primary, models.Post.user_id != user_id, None,
+                                                                    self.size, after=entry_cursor(newest)))
+
+    async def read(self, db: AsyncSession, user_id: int, page: PageParams) -> Tuple[List[models.Post], Optional[str]]:
+        if page.cursor is None or not await self.store.exists(user_id):
+            await self._sync(user_id)
+        prolific = [author_id for author_id in await self.store.prolific_authors() if author_id != user_id]
+
+        # Entries can point at posts that were deleted since they were written, so a page keeps reading until
+        # it has limit + 1 visible posts; after MAX_READ_ROUNDS it stops short and resumes from the last entry read
+        posts, before = [], entry_key(*page.cursor) if page.cursor else None
+        for _ in range(MAX_READ_ROUNDS):
+            wanted = page.limit + 1 - len(posts)
+            entries = await self._candidates(db, user_id, prolific, before, wanted)
+            if entries:
+                post_ids = [int(entry.split(":")[1]) for entry in entries]
+                rows = await db.execute(feed_query(user_id).where(models.Post.id.in_(post_ids)))
+                visible = {post.id: post for post in hydrate_feed(rows)}
+                posts += [visible[post_id] for post_id in post_ids if post_id in visible]
+                before = entries[-1]
+            if len(posts) > page.limit:
+                last = posts[page.limit - 1]
+                return posts[:page.limit], encode_cursor(last.create_date, last.id)
+            if len(entries) < wanted:
+                return posts, None
+        return posts, encode_cursor(*entry_cursor(before))
+
+    async def _candidates(self, db: AsyncSession, user_id: int, prolific: List[int], before: Optional[str],
+                          limit: int) -> List[str]:
+        entries = await self.store.range(user_id, before, limit)
+        if len(entries) < limit:
+            # Paged past the materialized window, carry on straight from the posts index
+            last = entries[-1] if entries else before
+            entries += await self._entries(db, models.Post.user_id != user_id, entry_cursor(last) if last else None,
+                                           limit - len(entries))
+        if prolific:
+            entries += await self._entries(db, models.Post.user_id.in_(prolific),
+                                           entry_cursor(before) if before else None, limit)
+        return sorted(set(entries), reverse=True)[:limit]
+
+    @staticmethod
+    async def _entries(db: AsyncSession, condition, before, limit: int, after=None) -> List[str]:
+        query = select(models.Post.create_date, models.Post.id).where(
+            condition, models.Post.deleted_at.is_(None))
+        if before:
+            query = query.where(tuple_(models.Post.create_date, models.Post.id) < tuple_(*before))
+        if after:
+            query = query.where(tuple_(models.Post.create_date, models.Post.id) > tuple_(*after))
+        query = query.order_by(models.Post.create_date.desc(), models.Post.id.desc()).limit(limit)
+        return [entry_key(create_date, post_id) for create_date, post_id in await db.execute(query)]
+
+
+def make_timeline_store(url: str):
+    if is_redis_url(url):
+        return RedisTimelineStore(redis_client(url), settings.TIMELINE_SIZE, settings.TIMELINE_IDLE_SECONDS)
+    return MemoryTimelineStore(settings.TIMELINE_SIZE, settings.TIMELINE_IDLE_SECONDS)
+
+
+timeline = Timeline(make_timeline_store(settings.CACHE_URL), settings.TIMELINE_SIZE,
+                    settings.TIMELINE_PROLIFIC_POSTS_PER_DAY)
@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from models import models
+
+logger = logging.getLogger('uvicorn.error')
+
+# Hacker News style: engagement divided by (age + 2h) ** gravity; a comment counts as two likes
+COMMENT_WEIGHT = 2
+GRAVITY = 1.8
+
+
+def hot_score(like_count: int, comment_count: int, create_date: datetime, now: Optional[datetime] = None) -> float:
+    points = like_count + COMMENT_WEIGHT * comment_count
+    if points <= 0:
+        return 0.0
+    age_hours = max(((now or datetime.now()) - create_date).total_seconds(), 0) / 3600
+    return points / (age_hours + 2) ** GRAVITY
+
+
+SCORE_COLUMNS = (models.Post.id, models.Post.like_count, models.Post.comment_count, models.Post.create_date)
+
+
+async def rescore(db: AsyncSession, rows):
+    # rows carry SCORE_COLUMNS; one executemany UPDATE by primary key, committed with the caller's transaction
+    now = datetime.now()
+    scores = [{"id": row.id, "trending_score": hot_score(row.like_count, row.comment_count, row.create_date, now)}
+              for row in rows]
+    if scores:
+        await db.execute(update(models.Post), scores)
+
+
+async def redecay(db: AsyncSession, top_k: Optional[int] = None) -> int:
+    # Stored scores only move on likes and comments, so a post nobody touches keeps its score from the last
+    # write. Decay only ever lowers scores, which means only the current top-K can be out of order: re-scoring
+    # them is enough, and a stale post just below the cut gets corrected on the next run if it climbs into it.
+    if top_k is None:
+        # Backfill: every post with any engagement, e.g. after adding the column to an existing database
+        query = select(*SCORE_COLUMNS).where((models.Post.like_count > 0) | (models.Post.comment_count > 0))
+    else:
+        query = select(*SCORE_COLUMNS).where(models.Post.trending_score > 0).order_by(
+            models.Post.trending_score.desc()).limit(top_k)
+    rows = (await db.execute(query)).all()
+    await rescore(db, rows)
+    await db.commit()
+    return len(rows)
+
+
+async def run(interval: int, top_k: int):
+    from core.database import SessionLocal
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with SessionLocal() as db:
+                await redecay(db, top_k)
+        except Exception:
+            logger.exception("Re-decaying trending scores failed")
+
+
+async def main():
+    from core.database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--all", action="store_true", help="re-score every post with likes or comments")
+    args = parser.parse_args()
+
+    async with SessionLocal() as session:
+        count = await redecay(session, None if args.all else settings.TRENDING_TOP_K)
+    await engine.dispose()
+    print(f"Re-scored {count} posts")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
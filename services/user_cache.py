@@ -0,0 +1,42 @@
+import json
+from datetime import datetime
+from typing import Optional
+from core.cache import cache_backend
+from core.config import settings
+from core.metrics import USER_CACHE_HITS, USER_CACHE_MISSES
+from models import models
+
+# The password hash never leaves the database, cached principals only carry the public profile
+PRINCIPAL_COLUMNS = [column.name for column in models.User.__table__.columns if column.name != "password"]
+
+
+class UserCache:
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+
+    async def _key(self, user_id: int, iat: int) -> str:
+        # Invalidation bumps the per-user version, orphaning every cached entry for that user at once
+        version = await self.backend.get(f"user:{user_id}:version") or "0"
+        return f"user:{user_id}:{version}:{iat}"
+
+    async def get(self, user_id: int, iat: int) -> Optional[models.User]:
+        cached = await self.backend.get(await self._key(user_id, iat))
+        if cached is None:
+            USER_CACHE_MISSES.inc()
+            return None
+        USER_CACHE_HITS.inc()
+        data = json.loads(cached)
+        if data["create_date"]:
+            data["create_date"] = datetime.fromisoformat(data["create_date"])
+        return models.User(**data)
+
+    async def set(self, user: models.User, iat: int):
+        data = {name: getattr(user, name) for name in PRINCIPAL_COLUMNS}
+        await self.backend.set(await self._key(user.id, iat), json.dumps(data, default=datetime.isoformat), self.ttl)
+
+    async def invalidate(self, user_id: int):
+        await self.backend.incr(f"user:{user_id}:version")
+
+
+user_cache = UserCache(cache_backend, settings.USER_CACHE_TTL_SECONDS)
@@ -0,0 +1,59 @@
+import itertools
+import os
+import tempfile
+
+# Settings and the module-level engines are built at import time, so the environment goes first
+DATA_DIR = tempfile.mkdtemp(prefix="api-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATA_DIR}/primary.db"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["CACHE_URL"] = "memory://"
+os.environ["EVENTS_BROKER_URL"] = "memory://"
+os.environ["UPLOAD_DIR"] = os.path.join(DATA_DIR, "uploads")
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["TRENDING_REDECAY_SECONDS"] = "0"
+os.environ["PURGE_INTERVAL_SECONDS"] = "0"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+import pytest
+from fastapi.testclient import TestClient
+
+PASSWORD = "password123"
+_usernames = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def run(client):
+    # Runs a coroutine function on the app's event loop, where the engines' pools live
+    return lambda function, *args: client.portal.call(function, *args)
+
+
+@pytest.fixture
+def signup(client):
+    def signup() -> dict:
+        username = f"user{next(_usernames)}"
+        response = client.post("/users/create_user", json={"full_name": "Test User", "username": username,
+                                                           "email": f"{username}@example.com", "password": PASSWORD})
+        assert response.status_code == 201, response.text
+        response = client.post("/auth/token", data={"username": username, "password": PASSWORD})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return signup
+
+
+@pytest.fixture
+def create_post(client):
+    def create_post(headers: dict, title: str = "title") -> int:
+        response = client.post("/posts/create_post", data={"title": title, "body": "body"}, headers=headers)
+        assert response.status_code == 201, response.text
+        return response.json()["post"]["id"]
+
+    return create_post
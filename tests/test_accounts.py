@@ -0,0 +1,29 @@
+def test_closing_an_account_hides_its_content_from_cached_reads(client, signup, create_post):
+    closing, other = signup(), signup()
+    own_post, other_post = create_post(closing), create_post(other)
+    for post_id in (own_post, other_post):
+        assert client.post("/comments/create_comment", json={"post_id": post_id, "body": "hi"},
+                           headers=closing).status_code == 201
+    assert client.post("/likes/likes", json={"post_id": own_post}, headers=other).status_code == 200
+
+    # Fill the caches first
+    assert client.get(f"/comments/{own_post}").json()["comments"]
+    assert client.get(f"/comments/{other_post}").json()["comments"]
+    assert own_post in [post["id"] for post in client.get("/posts/trending", headers=other).json()["posts"]]
+
+    assert client.delete("/users/me", headers=closing).status_code == 200
+
+    assert client.get(f"/comments/{own_post}").json()["comments"] == []
+    assert client.get(f"/comments/{other_post}").json()["comments"] == []
+    assert own_post not in [post["id"] for post in client.get("/posts/trending", headers=other).json()["posts"]]
+
+
+def test_deleting_a_post_drops_it_from_cached_trending(client, signup, create_post):
+    author, reader = signup(), signup()
+    post_id = create_post(author)
+    assert client.post("/likes/likes", json={"post_id": post_id}, headers=reader).status_code == 200
+    assert post_id in [post["id"] for post in client.get("/posts/trending", headers=reader).json()["posts"]]
+
+    assert client.delete(f"/posts/{post_id}", headers=author).status_code == 200
+
+    assert post_id not in [post["id"] for post in client.get("/posts/trending", headers=reader).json()["posts"]]
@@ -0,0 +1,32 @@
+def comment(client, headers: dict, post_id: int, body: str):
+    response = client.post("/comments/create_comment", json={"post_id": post_id, "body": body}, headers=headers)
+    assert response.status_code == 201, response.text
+
+
+def test_batch_skips_comments_of_closed_accounts(client, signup, create_post):
+    author, visible_commenter, closing_commenter = signup(), signup(), signup()
+    post_id = create_post(author)
+    comment(client, visible_commenter, post_id, "from b")
+    for i in range(4):
+        comment(client, closing_commenter, post_id, f"from c {i}")
+    assert client.delete("/users/me", headers=closing_commenter).status_code == 200
+
+    single = client.get(f"/comments/{post_id}").json()
+    batch = client.get("/comments/batch", params={"post_ids": [post_id], "limit": 3}).json()
+
+    assert [c["body"] for c in single["comments"]] == ["from b"]
+    assert batch["posts"] == [{"post_id": post_id, "comments": single["comments"], "next_cursor": None}]
+
+
+def test_batch_pages_each_post(client, signup, create_post):
+    author = signup()
+    busy, quiet = create_post(author), create_post(author)
+    for i in range(4):
+        comment(client, author, busy, f"comment {i}")
+
+    batch = client.get("/comments/batch", params={"post_ids": [quiet, busy], "limit": 3}).json()
+    by_post = {post["post_id"]: post for post in batch["posts"]}
+
+    assert [c["body"] for c in by_post[busy]["comments"]] == ["comment 3", "comment 2", "comment 1"]
+    assert by_post[busy]["next_cursor"] is not None
+    assert by_post[quiet] == {"post_id": quiet, "comments": [], "next_cursor": None}
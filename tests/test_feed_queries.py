@@ -0,0 +1,85 @@
+import pytest
+
+from core import instrumentation
+from core.database import SessionLocal
+from core.instrumentation import RequestStats
+from models import models
+
+N = 10
+
+
+@pytest.fixture
+def statements(monkeypatch):
+    # InstrumentationMiddleware creates one RequestStats per request and request_stats points at it while the
+    # request runs; recording them gives the number of SQL statements each request issued
+    recorded = []
+
+    class RecordingStats(RequestStats):
+        __slots__ = ()
+
+        def __init__(self):
+            super().__init__()
+            recorded.append(self)
+
+    monkeypatch.setattr(instrumentation, "RequestStats", RecordingStats)
+
+    def statements(response) -> int:
+        assert response.status_code == 200, response.text
+        return recorded[-1].statements
+
+    return statements
+
+
+def user_id(client, headers: dict) -> int:
+    # Also loads the caller into the user cache, so later requests don't pay for the lookup
+    return client.get("/users/me", headers=headers).json()["id"]
+
+
+def seed_posts(run, author_id: int, liker_id: int, count: int):
+    # Straight into the database, every other post liked and commented on by liker_id
+    async def seed():
+        async with SessionLocal() as db:
+            posts = [models.Post(title=f"post {i}", body="body", user_id=author_id) for i in range(count)]
+            db.add_all(posts)
+            await db.flush()
+            for post in posts[::2]:
+                db.add_all([models.Like(user_id=liker_id, post_id=post.id),
+                            models.Comment(body="comment", user_id=liker_id, post_id=post.id)])
+                post.like_count, post.comment_count = 1, 1
+            await db.commit()
+
+    run(seed)
+
+
+def test_user_feed_statements_do_not_grow_with_posts(client, run, signup, statements):
+    reader = signup()
+    reader_id = user_id(client, reader)
+    small_author, large_author = user_id(client, signup()), user_id(client, signup())
+    seed_posts(run, small_author, reader_id, N)
+    seed_posts(run, large_author, reader_id, 10 * N)
+
+    small = client.get(f"/posts/user/{small_author}", params={"limit": 10 * N}, headers=reader)
+    small_statements = statements(small)
+    large = client.get(f"/posts/user/{large_author}", params={"limit": 10 * N}, headers=reader)
+
+    assert len(small.json()["posts"]) == N and len(large.json()["posts"]) == 10 * N
+    assert statements(large) == small_statements
+
+
+def test_home_feed_statements_do_not_grow_with_posts(client, run, signup, statements):
+    reader = signup()
+    reader_id = user_id(client, reader)
+    author = user_id(client, signup())
+
+    seed_posts(run, author, reader_id, N)
+    client.get("/posts/all", headers=reader)
+    small = client.get("/posts/all", params={"limit": N}, headers=reader)
+    small_statements = statements(small)
+
+    seed_posts(run, author, reader_id, 9 * N)
+    client.get("/posts/all", headers=reader)
+    large = client.get("/posts/all", params={"limit": 10 * N}, headers=reader)
+
+    assert len(small.json()["posts"]) == N and len(large.json()["posts"]) == 10 * N
+    assert statements(large) == small_statements
+    assert any(post["userLike"] for post in large.json()["posts"])
@@ -0,0 +1,92 @@
+import math
+import sqlite3
+
+import pytest
+from starlette.requests import Request
+
+from core.config import settings
+from core.database import engine, make_engine
+from core.dependencies import get_read_db
+from core.replicas import ReplicaSet
+
+
+@pytest.fixture
+def replicate(monkeypatch, run, tmp_path):
+    # Stand-ins are snapshots of the primary taken when replicate() is called; anything written afterwards is
+    # missing from them, like on a replica that has not caught up yet
+    created = []
+
+    def replicate(urls=None) -> ReplicaSet:
+        if urls is None:
+            urls = []
+            for i in range(2):
+                path = tmp_path / f"replica{i}.db"
+                with sqlite3.connect(engine.url.database) as primary, sqlite3.connect(path) as replica:
+                    primary.backup(replica)
+                urls.append(f"sqlite:///{path}")
+        replicas = ReplicaSet([make_engine(url, f"test_replica{i}") for i, url in enumerate(urls)],
+                              settings.REPLICA_MAX_LAG_SECONDS)
+        monkeypatch.setattr("core.dependencies.replicas", replicas)
+        monkeypatch.setattr("core.response_cache.replicas", replicas)
+        created.append(replicas)
+        return replicas
+
+    yield replicate
+    for replicas in created:
+        run(replicas.dispose)
+
+
+def read_engine(run, headers: dict = None):
+    async def resolve():
+        request = Request({"type": "http", "method": "GET",
+                           "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]})
+        dependency = get_read_db(request)
+        db = await anext(dependency)
+        await dependency.aclose()
+        return db.bind
+
+    return run(resolve)
+
+
+def test_reads_rotate_over_replicas(run, replicate):
+    replicas = replicate()
+
+    assert {read_engine(run), read_engine(run)} == set(replicas.engines)
+
+
+def test_unreachable_and_lagging_replicas_are_skipped(run, replicate, tmp_path):
+    replicas = replicate([f"sqlite:///{tmp_path}/replica0.db", f"sqlite:///{tmp_path}/missing/replica1.db"])
+    run(replicas.refresh)
+
+    assert replicas.lag[0] == 0 and math.isinf(replicas.lag[1])
+    assert {read_engine(run), read_engine(run)} == {replicas.engines[0]}
+
+    replicas.lag[0] = settings.REPLICA_MAX_LAG_SECONDS + 1
+    assert read_engine(run) is engine
+
+
+def test_client_reads_its_own_writes_from_the_primary(client, run, replicate, signup, create_post):
+    headers = signup()
+    post_id = create_post(headers)
+    replicas = replicate()
+
+    response = client.post("/comments/create_comment", json={"post_id": post_id, "body": "hi"}, headers=headers)
+    assert response.status_code == 201
+
+    assert read_engine(run, headers) is engine
+    assert read_engine(run) in replicas.engines
+
+
+def test_cache_is_not_filled_from_a_lagging_replica(client, replicate, signup, create_post):
+    headers = signup()
+    post_id = create_post(headers)
+    replicate()
+    assert client.get(f"/comments/{post_id}").json()["comments"] == []
+
+    response = client.post("/comments/create_comment", json={"post_id": post_id, "body": "hi"}, headers=headers)
+    assert response.status_code == 201
+
+    # An anonymous reader is served by a replica that has not seen the comment yet; that answer must not be
+    # cached under the new tag version, where the writer would find it
+    assert client.get(f"/comments/{post_id}").json()["comments"] == []
+    assert [c["body"] for c in client.get(f"/comments/{post_id}", headers=headers).json()["comments"]] == ["hi"]
@@ -0,0 +1,8 @@
+def test_search_matches_substrings_inside_a_username(client):
+    response = client.post("/users/create_user", json={"full_name": "Marco Polo", "username": "marcopolo",
+                                                       "email": "marcopolo@example.com", "password": "password123"})
+    assert response.status_code == 201, response.text
+
+    for query in ("arc", "copol", "rco pol", "marco"):
+        usernames = [user["username"] for user in client.get("/users/search", params={"query": query}).json()["user"]]
+        assert "marcopolo" in usernames, query